@@ -13,12 +13,15 @@ from datetime import datetime
 
 sys.path.insert(0, str(Path(__file__).parent))
 
-from flask import Flask, request, jsonify, send_from_directory, session, redirect, url_for
+from flask import Flask, request, jsonify, send_from_directory, session, redirect, url_for, Response, stream_with_context
 from flask_cors import CORS
 
-from config import FAISS_INDEX_FILE, METADATA_FILE, GEMINI_API_KEY
+from config import (
+    FAISS_INDEX_FILE, METADATA_FILE, GEMINI_API_KEY, LLM_BACKEND, RESPONSE_CACHE_ENABLED, SEMANTIC_CACHE_ENABLED
+)
 from services.faiss_store import FAISSSearcher
 from services.query_handler import QueryHandler
+from services.async_runner import run_async
 from services import auth_service
 
 DASHBOARD_DIR = Path(__file__).parent / 'dashboard'
@@ -30,6 +33,10 @@ CORS(app)
 # ── Global service instances ─────────────────────────────
 faiss_searcher = None
 watsonx_service = None
+topic_catalog = None
+response_cache = None
+semantic_cache = None
+single_flight = None
 
 
 def get_faiss_searcher():
@@ -44,14 +51,55 @@ def get_faiss_searcher():
     return faiss_searcher
 
 
+def get_response_cache():
+    global response_cache
+    if response_cache is None and RESPONSE_CACHE_ENABLED:
+        try:
+            from services.response_cache import ResponseCache
+            response_cache = ResponseCache()
+            print("[OK] Response cache ready")
+        except Exception as e:
+            print(f"[WARN] Response cache unavailable: {e}")
+    return response_cache
+
+
+def get_semantic_cache():
+    global semantic_cache
+    if semantic_cache is None and SEMANTIC_CACHE_ENABLED:
+        from services.semantic_cache import SemanticCache
+        semantic_cache = SemanticCache()
+    return semantic_cache
+
+
+def get_single_flight():
+    global single_flight
+    if single_flight is None:
+        from services.single_flight import SingleFlight
+        single_flight = SingleFlight()
+    return single_flight
+
+
+def get_topic_catalog():
+    global topic_catalog
+    if topic_catalog is None:
+        try:
+            from services.topic_clusters import TopicCatalog
+            topic_catalog = TopicCatalog().load()
+            print("[OK] Topic catalog loaded")
+        except Exception as e:
+            print(f"[WARN] Topic catalog load failed: {e}")
+    return topic_catalog
+
+
 def get_watsonx_service():
     global watsonx_service
-    if watsonx_service is None and GEMINI_API_KEY:
+    # The fake backend (load tests) needs no API key
+    if watsonx_service is None and (GEMINI_API_KEY or LLM_BACKEND == 'fake'):
         try:
             from services.watsonx_service import WatsonxService
             watsonx_service = WatsonxService()
             watsonx_service.initialize()
-            print("[OK] AI service loaded (Gemini)")
+            print(f"[OK] AI service loaded ({watsonx_service.backend_name})")
         except Exception as e:
             print(f"[WARN] AI service failed: {e}")
     return watsonx_service
@@ -162,31 +210,21 @@ def serve_dashboard_files(filename):
 
 @app.route('/api/health', methods=['GET'])
 def health():
+    ai = get_watsonx_service()
     return jsonify({
         'status': 'ok',
         'auth_enabled': True,
         'faiss_ready': get_faiss_searcher() is not None,
-        'ai_ready': get_watsonx_service() is not None,
+        'ai_ready': ai is not None,
+        'llm_backend': ai.backend_name if ai else None,  # 'fake' during load tests
+        'llm_circuit': ai.breaker.state if ai else None,  # 'open': online answers are skipped (offline only)
+        'llm': ai.stats() if ai else None,  # Attempts, retries, latency percentiles, limiter queue depth, circuit
         'timestamp': datetime.now().isoformat()
     })
 
 
-@app.route('/api/query', methods=['POST'])
-def query():
-    data = request.get_json()
-    if not data or not data.get('query'):
-        return jsonify({'error': 'Missing query'}), 400
-
-    user_query = data['query'].strip()[:500]
-    online_mode = data.get('online_mode', True)
-    top_k = min(data.get('top_k', 5), 10)
-    location = data.get('location', 'India')  # e.g. "Lucknow, UP"
-    language = data.get('language', 'en')
-
-    start = time.time()
-
-    # Build date/season context
-    now = datetime.now()
+def _season_context(location, now):
+    """(season, context_info) for the LLM prompt: date, time, location and season"""
     month = now.month
     if month >= 10 or month <= 3:
         season = 'Rabi'
@@ -205,58 +243,65 @@ def query():
         f"Season: {season} (main crops: {season_crops})\n"
         f"Month: {now.strftime('%B')}\n"
     )
+    return season, context_info
+
+
+def _format_results(results):
+    """FAISS results as sent to the dashboard"""
+    retrieved = []
+    for r in results:
+        retrieved.append({
+            'question': r['metadata'].get('question', ''),
+            'answer': r['metadata'].get('answer', ''),
+            'confidence': round(r.get('confidence', 0) * 100),
+            'distance': round(r.get('distance', 0), 3),
+            'crop': r['metadata'].get('crop', ''),
+            'state': r['metadata'].get('state', ''),
+            'category': r['metadata'].get('category', ''),
+        })
+    return retrieved
+
+
+@app.route('/api/query', methods=['POST'])
+def query():
+    data = request.get_json()
+    if not data or not data.get('query'):
+        return jsonify({'error': 'Missing query'}), 400
+
+    user_query = data['query'].strip()[:500]
+    online_mode = data.get('online_mode', True)
+    top_k = min(data.get('top_k', 5), 10)
+    location = data.get('location', 'India')  # e.g. "Lucknow, UP"
+    language = data.get('language', 'en')
+
+    start = time.time()
+
+    # Build date/season context
+    now = datetime.now()
+    season, context_info = _season_context(location, now)
 
     searcher = get_faiss_searcher()
     if not searcher:
         return jsonify({'error': 'Knowledge base not loaded'}), 503
 
     ai = get_watsonx_service() if online_mode else None
-    handler = QueryHandler(searcher, ai)
+    handler = QueryHandler(searcher, ai, get_response_cache(), get_semantic_cache(), get_single_flight())
 
     try:
-        result = handler.process_query(
+        result = run_async(handler.process_query_async(
             user_query, top_k=top_k,
             online_mode=online_mode and ai is not None,
             location_context=context_info,
-            language=language
-        )
+            language=language,
+            location=location,
+            season=season
+        ))
         elapsed = time.time() - start
 
-        retrieved = []
-        for r in result.get('retrieved_results', []):
-            retrieved.append({
-                'question': r['metadata'].get('question', ''),
-                'answer': r['metadata'].get('answer', ''),
-                'confidence': round(r.get('confidence', 0) * 100),
-                'distance': round(r.get('distance', 0), 3),
-                'crop': r['metadata'].get('crop', ''),
-                'state': r['metadata'].get('state', ''),
-                'category': r['metadata'].get('category', ''),
-            })
+        retrieved = _format_results(result.get('retrieved_results', []))
 
+        # Empty retrieval already falls back to a no-context answer inside the handler
         ai_answer = result.get('online_answer', '')
-        if not retrieved and ai and online_mode:
-            try:
-                LANG_MAP = {
-                    'en': 'English', 'hi': 'Hindi', 'mr': 'Marathi', 'te': 'Telugu',
-                    'ta': 'Tamil', 'kn': 'Kannada', 'bn': 'Bengali', 'gu': 'Gujarati',
-                    'ml': 'Malayalam', 'pa': 'Punjabi'
-                }
-                lang_name = LANG_MAP.get(language, language)
-                lang_instr = ""
-                if language != 'en':
-                    lang_instr = f"\nIMPORTANT: Answer strictly in {lang_name} language."
-                
-                prompt = (
-                    f"Context:\n{context_info}\n"
-                    f"A farmer in {location} asked: '{user_query}'.\n"
-                    f"Provide a helpful, practical response specific to their "
-                    f"location and the current {season} season in India.\n"
-                    f"{lang_instr}"
-                )
-                ai_answer = ai.generate_response(prompt)
-            except:
-                pass
 
         return jsonify({
             'query': user_query,
@@ -266,6 +311,8 @@ def query():
             'num_results': len(retrieved),
             'elapsed': round(elapsed, 2),
             'mode': 'online' if (online_mode and ai) else 'offline',
+            'cache': result.get('cache', 'bypass'),
+            'degraded': result.get('degraded', False),  # LLM skipped or failed: offline answer only
             'location': location,
             'timestamp': now.strftime('%d %b %Y, %I:%M %p')
         })
@@ -274,6 +321,82 @@ def query():
         return jsonify({'error': str(e)}), 500
 
 
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.route('/api/query/stream', methods=['GET', 'POST'])
+def query_stream():
+    """
+    /api/query as Server-Sent Events
+
+    Events: 'offline' (FAISS answer and results, sent as soon as retrieval
+    finishes), 'token' ({text} pieces of the online answer), 'error', and
+    'done' (elapsed, cache status, degraded). GET takes the same fields as query
+    parameters so the browser EventSource API can be used.
+    """
+    data = request.get_json(silent=True) if request.method == 'POST' else request.args
+    if not data or not data.get('query'):
+        return jsonify({'error': 'Missing query'}), 400
+
+    user_query = data['query'].strip()[:500]
+    online_mode = str(data.get('online_mode', True)).lower() not in ('false', '0')
+    try:
+        top_k = max(1, min(int(data.get('top_k', 5)), 10))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'top_k must be an integer'}), 400
+    location = data.get('location', 'India')
+    language = data.get('language', 'en')
+
+    start = time.time()
+    now = datetime.now()
+    season, context_info = _season_context(location, now)
+
+    searcher = get_faiss_searcher()
+    if not searcher:
+        return jsonify({'error': 'Knowledge base not loaded'}), 503
+
+    ai = get_watsonx_service() if online_mode else None
+    handler = QueryHandler(searcher, ai, get_response_cache(), get_semantic_cache())
+
+    def events():
+        try:
+            for event, payload in handler.stream_query(
+                user_query, top_k=top_k,
+                online_mode=online_mode and ai is not None,
+                location_context=context_info,
+                language=language,
+                location=location,
+                season=season
+            ):
+                if event == 'offline':
+                    retrieved = _format_results(payload['retrieved_results'])
+                    yield _sse('offline', {
+                        'query': user_query,
+                        'offline_answer': payload['offline_answer'],
+                        'results': retrieved,
+                        'num_results': len(retrieved),
+                        'mode': 'online' if (online_mode and ai) else 'offline',
+                        'location': location,
+                        'timestamp': now.strftime('%d %b %Y, %I:%M %p'),
+                        'elapsed': round(time.time() - start, 2),
+                    })
+                elif event == 'token':
+                    yield _sse('token', {'text': payload})
+                elif event == 'error':
+                    yield _sse('error', {'error': payload})
+                else:
+                    yield _sse('done', {'cache': payload['cache'], 'degraded': payload.get('degraded', False),
+                                        'elapsed': round(time.time() - start, 2)})
+        except Exception as e:
+            yield _sse('error', {'error': str(e)})
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # Stop nginx-style proxies from buffering the stream
+    })
+
+
 
 
 # ── LIVE MARKET PRICES from data.gov.in ──────────────────
@@ -1049,6 +1172,23 @@ def popular_questions():
     return jsonify({'categories': categories})
 
 
+@app.route('/api/topics', methods=['GET'])
+def topics():
+    """Knowledge base topics from offline k-means clustering (no encoding per request)"""
+    catalog = get_topic_catalog()
+    if catalog is None:
+        return jsonify({'error': 'Topics not built. Run services/topic_clusters.py'}), 503
+
+    topic_id = request.args.get('id', type=int)
+    if topic_id is not None:
+        topic = catalog.get(topic_id)
+        if topic is None:
+            return jsonify({'error': f'Unknown topic: {topic_id}'}), 404
+        return jsonify({'topic': topic})
+
+    return jsonify({'topics': catalog.summary(request.args.get('questions', 3, type=int))})
+
+
 @app.route('/api/schemes', methods=['GET'])
 def schemes():
     """Government schemes data — multilingual"""
@@ -0,0 +1,97 @@
+"""
+Benchmark text cleaning + Q&A extraction in services/data_preprocessing.py
+Compares the old per-row path (apply + iterrows) with the vectorized one.
+
+Usage: python benchmark_preprocessing.py [ROWS]
+"""
+import json
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from services.data_preprocessing import (
+    TEXT_COLUMNS, clean_text, clean_text_series, extract_qa_pairs
+)
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+
+
+def build_frame(rows):
+    """Sample rows from the real Q&A pairs, with raw-dump style whitespace and placeholders"""
+    with open('data/kcc_qa_pairs.json', encoding='utf-8') as f:
+        qa = json.load(f)
+    rng = np.random.default_rng(0)
+    pick = [qa[i] for i in rng.integers(0, len(qa), rows)]
+    answers = [p['answer'] for p in pick]
+    for i in rng.integers(0, rows, rows // 20):
+        answers[i] = rng.choice(['NA', '-', '..........', ''])
+    return pd.DataFrame({
+        'QueryText': ['  ' + p['question'].replace(' ', '  ') + '\n' for p in pick],
+        'KccAns': answers,
+        'StateName': [p['metadata']['state'] for p in pick],
+        'DistrictName': [p['metadata']['district'] for p in pick],
+        'BlockName': ['Block ' + str(i % 50) for i in range(rows)],
+        'Crop': [p['metadata']['crop'] for p in pick],
+        'QueryType': [p['metadata']['query_type'] for p in pick],
+        'Category': [p['metadata']['category'] for p in pick],
+        'Season': [p['metadata']['season'] for p in pick],
+    })
+
+
+def legacy_is_valid_qa_pair(query, answer):
+    """Validator as it was before vectorization (regexes rebuilt per row)"""
+    if not query or not answer:
+        return False
+    if len(query) < 10 or len(answer) < 10:
+        return False
+    for pattern in [r'^NA$', r'^N/A$', r'^-$', r'^\.+$']:
+        if re.match(pattern, answer.strip(), re.IGNORECASE):
+            return False
+    return True
+
+
+def legacy(df):
+    for col in TEXT_COLUMNS:
+        df[col] = df[col].apply(clean_text)
+    qa_pairs = []
+    for idx, row in df.iterrows():
+        query = row.get('QueryText', '')
+        answer = row.get('KccAns', '')
+        if legacy_is_valid_qa_pair(query, answer):
+            qa_pairs.append({
+                'question': query,
+                'answer': answer,
+                'metadata': {
+                    'state': row.get('StateName', ''),
+                    'district': row.get('DistrictName', ''),
+                    'crop': row.get('Crop', ''),
+                    'category': row.get('Category', ''),
+                    'query_type': row.get('QueryType', ''),
+                    'season': row.get('Season', ''),
+                }
+            })
+    return qa_pairs
+
+
+def vectorized(df):
+    for col in TEXT_COLUMNS:
+        df[col] = clean_text_series(df[col])
+    return extract_qa_pairs(df)
+
+
+if __name__ == "__main__":
+    print(f"[INFO] Building {ROWS:,} sample rows...")
+    frame = build_frame(ROWS)
+
+    results = {}
+    for name, fn in [('per-row', legacy), ('vectorized', vectorized)]:
+        start = time.perf_counter()
+        results[name] = fn(frame.copy())
+        elapsed = time.perf_counter() - start
+        print(f"  {name:<11} {elapsed:7.2f}s  {ROWS / elapsed:>12,.0f} rows/sec")
+
+    same = results['per-row'] == results['vectorized']
+    print(f"\n[INFO] {len(results['vectorized']):,} pairs extracted | identical output: {same}")
@@ -0,0 +1,80 @@
+"""
+Benchmark FAISS index variants against exact search
+Reports recall@k, per-query latency and index size for each variant.
+
+Queries are corpus embeddings with small Gaussian noise (a stand-in for
+paraphrased farmer questions); ground truth is exact IndexFlatL2 search.
+
+The binary variants (Hamming scan + float re-rank) report the size of the
+in-RAM binary codes; their float vectors are memory-mapped from disk.
+
+Usage: python benchmark_retrieval.py [NUM_QUERIES]
+"""
+import pickle
+import sys
+import time
+
+import faiss
+import numpy as np
+
+from config import FAISS_INDEX_FILE, METADATA_FILE
+from services.faiss_store import build_index, binarize, reconstruct_vectors, BinaryRerankIndex
+
+NUM_QUERIES = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+K = 10
+NOISE = 0.02
+
+
+def load_vectors():
+    """Vectors of the shipped index (plain, PCA or id-mapped), without tombstones"""
+    vectors, ids = reconstruct_vectors(faiss.read_index(str(FAISS_INDEX_FILE)))
+    if ids is not None:
+        with open(METADATA_FILE, "rb") as f:
+            metadata = pickle.load(f)
+        vectors = vectors[np.array([int(i) in metadata for i in ids], dtype=bool)]
+    return vectors.astype('float32')
+
+
+def recall_at(found, truth, k):
+    hits = sum(len(set(f[:k]) & set(t[:k])) for f, t in zip(found, truth))
+    return hits / (k * len(truth))
+
+
+def variants(vectors):
+    """name -> index built over vectors"""
+    dim = vectors.shape[1]
+    yield f'flat-{dim}', build_index(vectors, pca_dimension=0)
+    for d in (192, 128, 64):
+        if d < dim:
+            yield f'pca-{d}', build_index(vectors, pca_dimension=d)
+    binary = faiss.IndexBinaryFlat(dim)
+    binary.add(binarize(vectors))
+    for candidates in (50, 100, 200):
+        yield f'binary-{candidates}', BinaryRerankIndex(binary, vectors, candidates=candidates)
+
+
+def index_size(index):
+    if isinstance(index, BinaryRerankIndex):
+        return len(faiss.serialize_index_binary(index.binary_index))
+    return len(faiss.serialize_index(index))
+
+
+if __name__ == "__main__":
+    vectors = load_vectors()
+    rng = np.random.default_rng(0)
+    picks = rng.choice(len(vectors), size=min(NUM_QUERIES, len(vectors)), replace=False)
+    queries = vectors[picks] + rng.normal(0, NOISE, size=(len(picks), vectors.shape[1])).astype('float32')
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, K)
+
+    print(f"[INFO] {len(vectors)} vectors x {vectors.shape[1]}d, {len(queries)} queries, k={K}")
+    print(f"\n  {'index':<14} {'recall@1':>8} {'recall@5':>8} {'recall@10':>9} {'ms/query':>9} {'size MB':>8}")
+    for name, index in variants(vectors):
+        start = time.perf_counter()
+        found = np.vstack([index.search(q[None, :], K)[1] for q in queries])
+        ms = (time.perf_counter() - start) * 1000 / len(queries)
+        size = index_size(index) / (1024 * 1024)
+        print(f"  {name:<14} {recall_at(found, truth, 1):>8.3f} {recall_at(found, truth, 5):>8.3f} "
+              f"{recall_at(found, truth, 10):>9.3f} {ms:>9.3f} {size:>8.2f}")
@@ -34,11 +34,18 @@ SERVICES_DIR.mkdir(exist_ok=True)
 RAW_DATA_FILE = DATA_DIR / "raw_kcc.csv"
 CLEAN_DATA_FILE = DATA_DIR / "clean_kcc.csv"
 QA_PAIRS_FILE = DATA_DIR / "kcc_qa_pairs.json"
+QA_PAIRS_PARQUET_FILE = DATA_DIR / "kcc_qa_pairs.parquet"  # Columnar alternative (needs pyarrow)
 
 # Embedding Files
 EMBEDDINGS_FILE = EMBEDDINGS_DIR / "kcc_embeddings.pkl"
 FAISS_INDEX_FILE = EMBEDDINGS_DIR / "faiss_index.bin"
 METADATA_FILE = EMBEDDINGS_DIR / "meta.pkl"
+BINARY_INDEX_FILE = EMBEDDINGS_DIR / "faiss_binary.bin"  # Sign-bit codes (INDEX_MODE=binary)
+VECTORS_FILE = EMBEDDINGS_DIR / "vectors.npy"  # Float vectors for re-ranking, memory-mapped
+VECTOR_IDS_FILE = EMBEDDINGS_DIR / "vector_ids.npy"  # Row -> stable id (id-mapped indexes only)
+KB_BUNDLE_FILE = EMBEDDINGS_DIR / "kb.bundle"  # Single-file index + vectors + metadata (services/kb_bundle.py)
+TOPICS_FILE = EMBEDDINGS_DIR / "topics.json"  # k-means topics served by /api/topics
+TOPIC_CENTROIDS_FILE = EMBEDDINGS_DIR / "topic_centroids.npz"
 
 # Google Gemini Configuration
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
@@ -50,6 +57,16 @@ EMBEDDING_DIMENSION = 384  # Dimension for all-MiniLM-L6-v2
 
 # FAISS Configuration
 TOP_K_RESULTS = int(os.getenv("TOP_K_RESULTS", "5"))
+PCA_DIMENSION = int(os.getenv("PCA_DIMENSION", "0"))  # e.g. 128 or 192; 0 keeps full 384-d vectors
+INDEX_MODE = os.getenv("INDEX_MODE", "flat")  # 'flat' (exact) or 'binary' (Hamming scan + float re-rank)
+BINARY_CANDIDATES = int(os.getenv("BINARY_CANDIDATES", "200"))  # Hamming candidates re-ranked per query
+USE_KB_BUNDLE = os.getenv("USE_KB_BUNDLE", "False").lower() == "true"  # Load KB_BUNDLE_FILE instead of loose files
+NUM_TOPICS = int(os.getenv("NUM_TOPICS", "12"))  # k-means clusters for topic browsing
+
+# Near-Duplicate Filtering (index rebuild)
+NEAR_DUP_SHINGLE_SIZE = int(os.getenv("NEAR_DUP_SHINGLE_SIZE", "4"))
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.8"))
+NEAR_DUP_NUM_PERM = int(os.getenv("NEAR_DUP_NUM_PERM", "64"))
 
 # Application Settings
 OFFLINE_MODE = os.getenv("OFFLINE_MODE", "False").lower() == "true"
@@ -58,6 +75,49 @@ OFFLINE_MODE = os.getenv("OFFLINE_MODE", "False").lower() == "true"
 LLM_MAX_TOKENS = 2048
 LLM_TEMPERATURE = 0.7
 LLM_TOP_P = 0.9
+PROMPT_CONTEXT_TOKEN_BUDGET = int(os.getenv("PROMPT_CONTEXT_TOKEN_BUDGET", "800"))  # Retrieved Q&A context per prompt
+PROMPT_MAX_ANSWER_TOKENS = int(os.getenv("PROMPT_MAX_ANSWER_TOKENS", "200"))  # Longer KCC answers are cut at a sentence
+SPECULATIVE_FALLBACK = os.getenv("SPECULATIVE_FALLBACK", "True").lower() == "true"  # Overlap the no-context answer with retrieval
+SINGLE_FLIGHT_TIMEOUT = float(os.getenv("SINGLE_FLIGHT_TIMEOUT", "30"))  # Seconds a duplicate query waits on the first one
+
+# LLM Calls (retries, timeouts, connection pool)
+LLM_CALL_TIMEOUT = float(os.getenv("LLM_CALL_TIMEOUT", "20"))  # Seconds per attempt
+LLM_REQUEST_DEADLINE = float(os.getenv("LLM_REQUEST_DEADLINE", "45"))  # Seconds for all attempts of one query (gunicorn kills at 120)
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))  # Seconds; doubles per retry, full jitter
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "20"))  # Keep-alive HTTP connections to Gemini
+LLM_MAX_CONCURRENT = int(os.getenv("LLM_MAX_CONCURRENT", "8"))  # Gemini calls in flight per process
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "60"))  # Per process; 0 = no rate limit
+LLM_RATE_BURST = int(os.getenv("LLM_RATE_BURST", "10"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "5"))  # Seconds to wait for a slot before answering offline
+LLM_BREAKER_WINDOW = int(os.getenv("LLM_BREAKER_WINDOW", "20"))  # Recent Gemini calls the breaker judges
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "5"))
+LLM_BREAKER_FAILURE_RATE = float(os.getenv("LLM_BREAKER_FAILURE_RATE", "0.5"))  # Opens at this failed fraction
+LLM_BREAKER_SLOW_CALL = float(os.getenv("LLM_BREAKER_SLOW_CALL", "15"))  # Seconds; slower successes count as slow
+LLM_BREAKER_SLOW_RATE = float(os.getenv("LLM_BREAKER_SLOW_RATE", "0.8"))  # Opens at this slow fraction
+LLM_BREAKER_OPEN_SECONDS = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30"))  # Offline-only period before a probe call
+
+# LLM Backend ('gemini', or 'fake' for offline load tests: no API key or quota needed)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+LLM_FAKE_LATENCY_MEDIAN = float(os.getenv("LLM_FAKE_LATENCY_MEDIAN", "0.8"))  # Seconds (log-normal)
+LLM_FAKE_LATENCY_P95 = float(os.getenv("LLM_FAKE_LATENCY_P95", "2.0"))
+LLM_FAKE_ERROR_RATE = float(os.getenv("LLM_FAKE_ERROR_RATE", "0"))  # Fraction of calls failing with a 503
+LLM_FAKE_CHUNK_CHARS = int(os.getenv("LLM_FAKE_CHUNK_CHARS", "40"))  # Characters per streamed chunk
+LLM_FAKE_SEED = int(os.getenv("LLM_FAKE_SEED", "42"))
+LLM_FAKE_ANSWERS_FILE = os.getenv("LLM_FAKE_ANSWERS_FILE", "")  # Optional JSON list of canned answers
+
+# Response Cache (online answers, shared by all workers via SQLite)
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "True").lower() == "true"
+RESPONSE_CACHE_FILE = Path(os.getenv("RESPONSE_CACHE_FILE", str(CACHE_DIR / "response_cache.db")))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", str(24 * 3600)))  # Seconds
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "20000"))
+
+# Semantic Cache (per worker; reuses answers for reworded queries)
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "True").lower() == "true"
+SEMANTIC_CACHE_MAX_DISTANCE = float(os.getenv("SEMANTIC_CACHE_MAX_DISTANCE", "0.2"))  # Squared L2 between query embeddings
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", str(24 * 3600)))  # Seconds
+SEMANTIC_CACHE_CAPACITY = int(os.getenv("SEMANTIC_CACHE_CAPACITY", "5000"))
 
 def validate_config():
     """Validate critical configuration settings"""
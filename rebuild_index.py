@@ -1,20 +1,28 @@
 """
 Rebuild FAISS Index from Large KCC Dataset
-Processes kcc_dataset.csv (7.3GB) to extract QA pairs and rebuild embeddings
+Processes kcc_dataset.csv (7.3GB, optionally .zst/.gz/.bz2 compressed)
+to extract QA pairs and rebuild embeddings
 """
 
 import csv
-import json
+import io
+import os
 import pickle
+import random
 import numpy as np
 import sys
+import time
+from multiprocessing import Pool
 from pathlib import Path
 
 # Add parent for config imports
 sys.path.append(str(Path(__file__).parent))
+from services import qa_store
+from services.compressed_io import compression_of, find_input, open_text
+from services.fingerprint_set import FingerprintSet, fingerprint
 from config import (
     DATA_DIR, EMBEDDINGS_DIR,
-    FAISS_INDEX_FILE, METADATA_FILE, EMBEDDINGS_FILE,
+    FAISS_INDEX_FILE, METADATA_FILE, EMBEDDINGS_FILE, QA_PAIRS_PARQUET_FILE,
     SENTENCE_TRANSFORMER_MODEL, EMBEDDING_DIMENSION
 )
 
@@ -23,70 +31,434 @@ QA_OUTPUT = DATA_DIR / "kcc_qa_pairs.json"
 MAX_PAIRS = 2000  # Limit for reasonable memory usage
 
 
-def extract_qa_pairs(csv_path, max_pairs=MAX_PAIRS):
-    """Extract unique Q&A pairs from the large CSV"""
+def _row_to_pair(row):
+    """Convert a CSV row to a Q&A pair dict, or None if it is empty/too short"""
+    question = (row.get('QueryText') or '').strip()
+    answer = (row.get('KccAns') or '').strip()
+
+    # Skip empty or very short Q&A
+    if len(question) < 10 or len(answer) < 10:
+        return None
+
+    return {
+        "question": question,
+        "answer": answer,
+        "metadata": {
+            "state": (row.get('StateName') or '').strip().title(),
+            "district": (row.get('DistrictName') or '').strip().title(),
+            "crop": (row.get('Crop') or '').strip().title(),
+            "category": (row.get('Category') or '').strip().title(),
+            "query_type": (row.get('QueryType') or '').strip(),
+            "season": (row.get('Season') or '').strip().title()
+        }
+    }
+
+
+def extract_qa_pairs(csv_path, max_pairs=MAX_PAIRS, near_dup=None, spill_path=None):
+    """
+    Extract unique Q&A pairs from the large CSV
+
+    Args:
+        csv_path: Path to the KCC CSV
+        max_pairs: Stop after this many pairs (None for no limit)
+        near_dup: Optional NearDuplicateFilter; questions it flags are dropped
+        spill_path: Optional file to back the dedup table (see FingerprintSet)
+    """
     print(f"[INFO] Reading CSV: {csv_path}")
     print(f"[INFO] Max pairs to extract: {max_pairs}")
 
     qa_pairs = []
-    seen_questions = set()
+    seen_questions = FingerprintSet(spill_path=spill_path)
     skipped = 0
+    near_dups = 0
     total = 0
 
-    with open(csv_path, encoding='utf-8', errors='replace') as f:
+    with open_text(csv_path) as f:
         reader = csv.DictReader(f)
         for row in reader:
             total += 1
             if total % 500_000 == 0:
                 print(f"  ... processed {total:,} rows, extracted {len(qa_pairs)} pairs")
 
-            question = (row.get('QueryText') or '').strip()
-            answer = (row.get('KccAns') or '').strip()
-
-            # Skip empty or very short Q&A
-            if len(question) < 10 or len(answer) < 10:
+            pair = _row_to_pair(row)
+            if pair is None:
                 skipped += 1
                 continue
 
             # Deduplicate by question text (case-insensitive)
-            q_key = question.lower()
-            if q_key in seen_questions:
+            if not seen_questions.add(fingerprint(pair["question"].lower())):
+                continue
+
+            if near_dup is not None and near_dup.is_duplicate(pair["question"]):
+                near_dups += 1
                 continue
-            seen_questions.add(q_key)
-
-            qa_pairs.append({
-                "question": question,
-                "answer": answer,
-                "metadata": {
-                    "state": (row.get('StateName') or '').strip().title(),
-                    "district": (row.get('DistrictName') or '').strip().title(),
-                    "crop": (row.get('Crop') or '').strip().title(),
-                    "category": (row.get('Category') or '').strip().title(),
-                    "query_type": (row.get('QueryType') or '').strip(),
-                    "season": (row.get('Season') or '').strip().title()
-                }
-            })
-
-            if len(qa_pairs) >= max_pairs:
+
+            qa_pairs.append(pair)
+
+            if max_pairs and len(qa_pairs) >= max_pairs:
                 print(f"[INFO] Reached max pairs limit ({max_pairs})")
                 break
 
     print(f"\n[DONE] Processed {total:,} rows total")
     print(f"  Extracted: {len(qa_pairs)} unique Q&A pairs")
     print(f"  Skipped: {skipped:,} (empty/short)")
+    if near_dup is not None:
+        print(f"  Near-duplicates dropped: {near_dups:,}")
+    print(f"  Dedup table: {len(seen_questions):,} keys in {seen_questions.nbytes / (1024*1024):.1f} MB")
+    seen_questions.close()
+    return qa_pairs
+
+
+# A split point farther than this from the next record boundary means the quote parity is off
+_MAX_RECORD_BYTES = 1024 * 1024
+
+# Bytes read to check that a candidate boundary starts a whole record
+_RECORD_PROBE_BYTES = 64 * 1024
+
+
+class _ByteRangeReader(io.RawIOBase):
+    """Raw binary reader limited to the byte range [start, end) of a file"""
+
+    def __init__(self, path, start, end):
+        self._f = open(path, 'rb')
+        self._f.seek(start)
+        self._remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self._remaining <= 0:
+            return 0
+        n = self._f.readinto(memoryview(b)[:min(len(b), self._remaining)])
+        self._remaining -= n
+        return n
+
+    def close(self):
+        self._f.close()
+        super().close()
+
+
+def _starts_record(f, position, num_fields):
+    """True if the CSV text at byte position parses as one record of num_fields fields"""
+    f.seek(position)
+    text = f.read(_RECORD_PROBE_BYTES).decode('utf-8', errors='replace')
+    if not text:
+        return True  # End of file
+    row = next(csv.reader(io.StringIO(text, newline='')), None)
+    return row is not None and len(row) == num_fields
+
+
+def _record_boundaries(csv_path, num_parts, num_fields, block_size=16 * 1024 * 1024,
+                       max_record_bytes=_MAX_RECORD_BYTES):
+    """
+    Split a CSV file into byte ranges that start and end on record boundaries
+
+    A newline ends a record only if an even number of quote characters
+    precede it (doubled "" escapes keep the parity), so newlines inside
+    quoted fields are never chosen. The quote count is carried forward
+    between candidates, so the scan is linear in the file size. The first
+    range starts after the header.
+
+    A stray quote in an unquoted field flips the parity for the rest of
+    the file, so each candidate is also checked to start a record of
+    num_fields fields; when it does not, the parity is flipped and the
+    search continues. If no boundary turns up within max_record_bytes of
+    a split point, None is returned (parse serially).
+
+    Returns:
+        List of (start, end) byte offsets, or None
+    """
+    size = Path(csv_path).stat().st_size
+    targets = [0] + [size * i // num_parts for i in range(1, num_parts)]
+    boundaries = []
+
+    quotes = 0         # quote chars in the file before offset + pos
+    offset = 0
+    searching = None   # file position the pending boundary search started at
+    with open(csv_path, 'rb') as f, open(csv_path, 'rb') as probe:
+        while targets:
+            block = f.read(block_size)
+            if not block:
+                break
+            block_end = offset + len(block)
+            pos = 0
+            # Search every pending target that falls inside this block
+            while targets and targets[0] < block_end:
+                target = max(targets[0], boundaries[-1] if boundaries else 0) - offset
+                if target > pos:
+                    quotes += block.count(b'"', pos, target)
+                    pos = target
+                if searching is None:
+                    searching = offset + pos
+                found = None
+                while True:
+                    nl = block.find(b'\n', pos)
+                    if nl == -1 or offset + nl - searching > max_record_bytes:
+                        break
+                    quotes += block.count(b'"', pos, nl)
+                    pos = nl + 1
+                    if quotes % 2 == 0:
+                        if _starts_record(probe, offset + pos, num_fields):
+                            found = offset + pos
+                            break
+                        # Inside a quoted field after all: a stray quote came earlier
+                        quotes += 1
+                if found is None:
+                    if nl != -1 or block_end - searching > max_record_bytes:
+                        print(f"[WARN] No CSV record boundary within {max_record_bytes:,} bytes of "
+                              f"offset {searching:,} (unbalanced quote?)")
+                        return None
+                    # Boundary lies in a later block
+                    targets[0] = block_end
+                    break
+                searching = None
+                targets.pop(0)
+                if not boundaries or found > boundaries[-1]:
+                    boundaries.append(found)
+            quotes += block.count(b'"', pos)
+            offset = block_end
+
+    if not boundaries or boundaries[-1] < size:
+        boundaries.append(size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def _extract_range(args):
+    """Worker: parse one byte range and return its locally unique Q&A pairs"""
+    csv_path, fieldnames, start, end, max_pairs = args
+
+    qa_pairs = []
+    seen_questions = FingerprintSet()
+    skipped = 0
+    total = 0
+
+    with io.TextIOWrapper(io.BufferedReader(_ByteRangeReader(csv_path, start, end)),
+                          encoding='utf-8', errors='replace') as f:
+        for row in csv.DictReader(f, fieldnames=fieldnames):
+            total += 1
+            pair = _row_to_pair(row)
+            if pair is None:
+                skipped += 1
+                continue
+
+            if not seen_questions.add(fingerprint(pair["question"].lower())):
+                continue
+            qa_pairs.append(pair)
+
+            # No range can contribute more than max_pairs to the merged output
+            if max_pairs and len(qa_pairs) >= max_pairs:
+                break
+
+    return qa_pairs, total, skipped
+
+
+def extract_qa_pairs_parallel(csv_path, max_pairs=MAX_PAIRS, workers=None, near_dup=None,
+                              spill_path=None):
+    """
+    Extract unique Q&A pairs from the large CSV using a process pool
+
+    The file is split into byte ranges aligned on record boundaries, each
+    range is parsed by a worker, and the results are merged in file order
+    with global deduplication, so the output matches extract_qa_pairs.
+    Near-duplicate filtering runs during the ordered merge.
+    """
+    if compression_of(csv_path):
+        # Compressed streams cannot be split into byte ranges
+        print(f"[INFO] {csv_path} is compressed; extracting serially")
+        return extract_qa_pairs(csv_path, max_pairs, near_dup=near_dup, spill_path=spill_path)
+
+    workers = workers or os.cpu_count() or 1
+    print(f"[INFO] Reading CSV: {csv_path} ({workers} workers)")
+    print(f"[INFO] Max pairs to extract: {max_pairs}")
+
+    with open(csv_path, encoding='utf-8', errors='replace', newline='') as f:
+        fieldnames = next(csv.reader(f))
+
+    # Several ranges per worker so uneven ranges still balance out
+    ranges = _record_boundaries(csv_path, workers * 4, len(fieldnames))
+    if ranges is None:
+        print("[INFO] Cannot split on record boundaries; extracting serially")
+        return extract_qa_pairs(csv_path, max_pairs, near_dup=near_dup, spill_path=spill_path)
+    print(f"[INFO] Split into {len(ranges)} byte ranges")
+
+    qa_pairs = []
+    seen_questions = FingerprintSet(spill_path=spill_path)
+    skipped = 0
+    near_dups = 0
+    total = 0
+
+    def merge(range_pairs):
+        """Add a range's pairs in order; True once max_pairs is reached"""
+        nonlocal near_dups
+        for pair in range_pairs:
+            if not seen_questions.add(fingerprint(pair["question"].lower())):
+                continue
+            if near_dup is not None and near_dup.is_duplicate(pair["question"]):
+                near_dups += 1
+                continue
+            qa_pairs.append(pair)
+            if max_pairs and len(qa_pairs) >= max_pairs:
+                return True
+        return False
+
+    tasks = [(str(csv_path), fieldnames, start, end, max_pairs) for start, end in ranges]
+    with Pool(workers) as pool:
+        for task, (range_pairs, range_total, range_skipped) in zip(tasks, pool.imap(_extract_range, tasks)):
+            total += range_total
+            skipped += range_skipped
+            done = merge(range_pairs)
+            if not done and max_pairs and len(range_pairs) >= max_pairs:
+                # The worker stopped at max_pairs locally unique pairs, but the merge dropped
+                # some (seen in earlier ranges, or near-duplicates): read the rest of the range.
+                # Pairs merged already are skipped by the global dedup.
+                range_pairs, full_total, full_skipped = _extract_range(task[:-1] + (None,))
+                total += full_total - range_total
+                skipped += full_skipped - range_skipped
+                done = merge(range_pairs)
+            print(f"  ... processed {total:,} rows, extracted {len(qa_pairs)} pairs")
+            if done:
+                print(f"[INFO] Reached max pairs limit ({max_pairs})")
+                pool.terminate()
+                break
+
+    print(f"\n[DONE] Processed {total:,} rows total")
+    print(f"  Extracted: {len(qa_pairs)} unique Q&A pairs")
+    print(f"  Skipped: {skipped:,} (empty/short)")
+    if near_dup is not None:
+        print(f"  Near-duplicates dropped: {near_dups:,}")
+    print(f"  Dedup table: {len(seen_questions):,} keys in {seen_questions.nbytes / (1024*1024):.1f} MB")
+    seen_questions.close()
+    return qa_pairs
+
+
+class StratifiedReservoir:
+    """
+    Single-pass stratified sample with a fixed total budget
+
+    Every stratum keeps a uniform reservoir of at most `quota` items. The
+    quota is the largest level q with sum(min(seen_s, q)) <= budget, so
+    small strata keep everything and large ones share the rest equally.
+    Counts only grow, so the quota only falls; shrinking a reservoir by a
+    uniform subsample keeps it uniform. Memory is bounded by
+    max(budget, number of strata) items plus one counter per stratum.
+    """
+
+    def __init__(self, budget, seed=42):
+        self.budget = budget
+        self.quota = budget
+        self.rng = random.Random(seed)
+        self.seen = {}
+        self.reservoirs = {}
+        self.size = 0
+
+    def add(self, stratum, item):
+        n = self.seen.get(stratum, 0) + 1
+        self.seen[stratum] = n
+        reservoir = self.reservoirs.setdefault(stratum, [])
+
+        if len(reservoir) < self.quota:
+            reservoir.append(item)
+            self.size += 1
+            if self.size > self.budget:
+                self._lower_quota()
+        else:
+            j = self.rng.randrange(n)
+            if j < self.quota:
+                reservoir[j] = item
+
+    def _lower_quota(self):
+        """Water-fill: find the highest quota that fits the budget, then shrink"""
+        if self.quota == 1:
+            # More strata than budget: keep one per stratum, trim in items()
+            return
+        counts = list(self.seen.values())
+        lo, hi = 1, self.quota
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if sum(min(c, mid) for c in counts) <= self.budget:
+                lo = mid
+            else:
+                hi = mid - 1
+        self.quota = lo
+
+        for stratum, reservoir in self.reservoirs.items():
+            if len(reservoir) > self.quota:
+                self.reservoirs[stratum] = self.rng.sample(reservoir, self.quota)
+        self.size = sum(len(r) for r in self.reservoirs.values())
+
+    def items(self):
+        """Sampled items; if there are more strata than budget, a random subset"""
+        items = [item for reservoir in self.reservoirs.values() for item in reservoir]
+        if len(items) > self.budget:
+            items = self.rng.sample(items, self.budget)
+        return items
+
+
+def sample_qa_pairs(csv_path, max_pairs=MAX_PAIRS, seed=42, near_dup=None, spill_path=None):
+    """
+    Draw a representative capped set of Q&A pairs in one streaming read
+
+    Unique pairs are stratified by state x crop x category and sampled with
+    StratifiedReservoir, instead of keeping the first max_pairs rows.
+    Returned pairs are in file order.
+    """
+    print(f"[INFO] Sampling CSV: {csv_path}")
+    print(f"[INFO] Sample size: {max_pairs} (stratified by state x crop x category)")
+
+    sampler = StratifiedReservoir(max_pairs, seed=seed)
+    seen_questions = FingerprintSet(spill_path=spill_path)
+    skipped = 0
+    near_dups = 0
+    unique = 0
+    total = 0
+
+    with open_text(csv_path) as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            total += 1
+            if total % 500_000 == 0:
+                print(f"  ... processed {total:,} rows, {len(sampler.seen):,} strata, "
+                      f"quota {sampler.quota} per stratum")
+
+            pair = _row_to_pair(row)
+            if pair is None:
+                skipped += 1
+                continue
+
+            if not seen_questions.add(fingerprint(pair["question"].lower())):
+                continue
+
+            if near_dup is not None and near_dup.is_duplicate(pair["question"]):
+                near_dups += 1
+                continue
+
+            unique += 1
+            meta = pair["metadata"]
+            sampler.add((meta["state"], meta["crop"], meta["category"]), (total, pair))
+
+    qa_pairs = [pair for _, pair in sorted(sampler.items(), key=lambda x: x[0])]
+    seen_questions.close()
+
+    print(f"\n[DONE] Processed {total:,} rows total")
+    print(f"  Unique pairs: {unique:,} in {len(sampler.seen):,} strata")
+    print(f"  Sampled: {len(qa_pairs)} Q&A pairs (quota {sampler.quota} per stratum)")
+    print(f"  Skipped: {skipped:,} (empty/short)")
+    if near_dup is not None:
+        print(f"  Near-duplicates dropped: {near_dups:,}")
     return qa_pairs
 
 
 def save_qa_pairs(qa_pairs, output_path):
-    """Save QA pairs to JSON"""
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(qa_pairs, f, indent=2, ensure_ascii=False)
+    """Save QA pairs to JSON (or Parquet if output_path ends in .parquet)"""
+    qa_store.save_qa_pairs(qa_pairs, output_path)
     print(f"[SAVED] QA pairs → {output_path} ({len(qa_pairs)} entries)")
 
 
 def generate_embeddings(qa_pairs):
     """Generate sentence embeddings for all QA pairs"""
     from sentence_transformers import SentenceTransformer
+    from services.generate_embeddings import encode_length_bucketed
 
     print(f"\n[INFO] Loading model: {SENTENCE_TRANSFORMER_MODEL}")
     model = SentenceTransformer(SENTENCE_TRANSFORMER_MODEL)
@@ -95,8 +467,11 @@ def generate_embeddings(qa_pairs):
     texts = [f"{qa['question']} {qa['answer']}" for qa in qa_pairs]
 
     print(f"[INFO] Generating embeddings for {len(texts)} texts...")
-    embeddings = model.encode(texts, show_progress_bar=True, batch_size=64)
+    start = time.time()
+    embeddings = encode_length_bucketed(model, texts, batch_size=64)
+    elapsed = time.time() - start
     print(f"[DONE] Embeddings shape: {embeddings.shape}")
+    print(f"  Throughput: {len(texts) / max(elapsed, 1e-9):.1f} texts/sec ({elapsed:.1f}s)")
 
     # Package as records
     records = []
@@ -112,13 +487,13 @@ def generate_embeddings(qa_pairs):
 def build_faiss_index(embeddings, records):
     """Build and save FAISS index"""
     import faiss
+    from services.faiss_store import build_index
 
     embeddings_array = np.array(embeddings).astype('float32')
     dimension = embeddings_array.shape[1]
 
     print(f"\n[INFO] Building FAISS index (dim={dimension}, n={len(embeddings_array)})")
-    index = faiss.IndexFlatL2(dimension)
-    index.add(embeddings_array)
+    index = build_index(embeddings_array)
     print(f"[DONE] Index has {index.ntotal} vectors")
 
     # Save index
@@ -148,16 +523,39 @@ def main():
     print("KrishiMind AI — Rebuild FAISS Index")
     print("=" * 60)
 
-    if not LARGE_CSV.exists():
+    # kcc_dataset.csv, or a .zst/.gz/.bz2 copy of it (read with streaming decompression)
+    csv_path = find_input(LARGE_CSV)
+    if not csv_path.exists():
         print(f"\n[ERROR] Dataset not found: {LARGE_CSV}")
-        print("Please place kcc_dataset.csv in the data/ folder")
+        print("Please place kcc_dataset.csv (or kcc_dataset.csv.zst/.gz/.bz2) in the data/ folder")
         sys.exit(1)
 
     # Step 1: Extract QA pairs
-    qa_pairs = extract_qa_pairs(LARGE_CSV)
-
-    # Step 2: Save QA pairs
-    save_qa_pairs(qa_pairs, QA_OUTPUT)
+    #   --workers N   parse the CSV in N processes
+    #   --near-dup    drop near-duplicate questions (MinHash LSH, see config.py)
+    #   --spill PATH  keep the dedup table in a memory-mapped file
+    #   --sample      stratified sample of MAX_PAIRS over the whole file
+    #                 instead of the first MAX_PAIRS unique rows
+    near_dup = None
+    if '--near-dup' in sys.argv:
+        from services.near_dedup import NearDuplicateFilter
+        near_dup = NearDuplicateFilter()
+
+    spill_path = None
+    if '--spill' in sys.argv:
+        spill_path = sys.argv[sys.argv.index('--spill') + 1]
+
+    if '--sample' in sys.argv:
+        qa_pairs = sample_qa_pairs(csv_path, near_dup=near_dup, spill_path=spill_path)
+    elif '--workers' in sys.argv:
+        workers = int(sys.argv[sys.argv.index('--workers') + 1])
+        qa_pairs = extract_qa_pairs_parallel(csv_path, workers=workers, near_dup=near_dup,
+                                             spill_path=spill_path)
+    else:
+        qa_pairs = extract_qa_pairs(csv_path, near_dup=near_dup, spill_path=spill_path)
+
+    # Step 2: Save QA pairs (--parquet writes the columnar format instead)
+    save_qa_pairs(qa_pairs, QA_PAIRS_PARQUET_FILE if '--parquet' in sys.argv else QA_OUTPUT)
 
     # Step 3: Generate embeddings
     records, embeddings = generate_embeddings(qa_pairs)
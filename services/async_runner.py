@@ -0,0 +1,44 @@
+"""
+Async Runner Module
+One long-lived event loop, in a daemon thread, for running coroutines
+from synchronous code (Flask views, gunicorn sync workers)
+"""
+
+import asyncio
+import threading
+
+_loop = None
+_lock = threading.Lock()
+
+
+def get_loop():
+    """The shared background event loop, started on first use"""
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="async-runner", daemon=True).start()
+    return _loop
+
+
+def run_async(coro, timeout=None):
+    """
+    Run a coroutine on the shared loop and block until it finishes
+
+    A single loop (rather than asyncio.run per call) lets async HTTP
+    clients keep their connection pools between requests.
+
+    Args:
+        coro: Coroutine to run
+        timeout: Seconds to wait; on expiry the coroutine is cancelled and
+                 concurrent.futures.TimeoutError is raised
+
+    Returns:
+        The coroutine's result
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, get_loop())
+    try:
+        return future.result(timeout)
+    except BaseException:
+        future.cancel()
+        raise
@@ -0,0 +1,212 @@
+"""
+Build Pipeline Module
+Runs preprocessing -> embeddings -> FAISS index, skipping stages whose
+inputs have not changed since their outputs were last built
+"""
+
+import hashlib
+import json
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+from config import (
+    RAW_DATA_FILE, CLEAN_DATA_FILE, QA_PAIRS_FILE,
+    EMBEDDINGS_FILE, FAISS_INDEX_FILE, METADATA_FILE, EMBEDDINGS_DIR,
+    TOPICS_FILE, TOPIC_CENTROIDS_FILE, NUM_TOPICS, KB_BUNDLE_FILE, USE_KB_BUNDLE,
+    SENTENCE_TRANSFORMER_MODEL, EMBEDDING_DIMENSION, INDEX_MODE, PCA_DIMENSION,
+    BINARY_INDEX_FILE, VECTORS_FILE, VECTOR_IDS_FILE
+)
+
+MANIFEST_FILE = EMBEDDINGS_DIR / "build_manifest.json"
+
+
+class Stage:
+    """One pipeline step: run(**params) turns inputs into outputs"""
+
+    def __init__(self, name, run, inputs, outputs, params=None, config=None, sources=()):
+        """
+        Args:
+            name: Stage name (manifest key)
+            run: Callable returning True on success
+            inputs: Files the stage reads
+            outputs: Files the stage writes
+            params: Keyword arguments passed to run (part of the fingerprint)
+            config: Other settings the stage reads itself (part of the fingerprint)
+            sources: Code files whose changes should invalidate the stage
+        """
+        self.name = name
+        self.run = run
+        self.inputs = [Path(p) for p in inputs]
+        self.outputs = [Path(p) for p in outputs]
+        self.params = params or {}
+        self.config = config or {}
+        self.sources = [Path(p) for p in sources]
+
+
+class PipelineRunner:
+    """Fingerprint-based stage runner (a tiny make for the index build)"""
+
+    def __init__(self, manifest_file=MANIFEST_FILE):
+        self.manifest_file = Path(manifest_file)
+        self.manifest = {'stages': {}, 'file_hashes': {}}
+        if self.manifest_file.exists():
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+
+    def _save(self):
+        self.manifest_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_file.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2)
+        tmp.replace(self.manifest_file)
+
+    def file_hash(self, path):
+        """SHA-256 of a file, cached by (size, mtime) so unchanged files are not re-read"""
+        path = Path(path)
+        if not path.exists():
+            return None
+        stat = path.stat()
+        key = str(path.resolve())
+        cached = self.manifest['file_hashes'].get(key)
+        if cached and cached['size'] == stat.st_size and cached['mtime'] == stat.st_mtime_ns:
+            return cached['sha256']
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(8 * 1024 * 1024), b''):
+                digest.update(block)
+        self.manifest['file_hashes'][key] = {
+            'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'sha256': digest.hexdigest()
+        }
+        return digest.hexdigest()
+
+    def fingerprint(self, stage):
+        """Fingerprint of everything a stage's output depends on"""
+        payload = {
+            'inputs': {str(p): self.file_hash(p) for p in stage.inputs},
+            'sources': {str(p): self.file_hash(p) for p in stage.sources},
+            'params': {k: str(v) for k, v in sorted(stage.params.items())},
+            'config': {k: str(v) for k, v in sorted(stage.config.items())},
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def is_fresh(self, stage):
+        record = self.manifest['stages'].get(stage.name)
+        if not record or record['fingerprint'] != self.fingerprint(stage):
+            return False
+        # Outputs must still be the files this stage produced
+        return all(self.file_hash(p) == record['outputs'].get(str(p)) for p in stage.outputs)
+
+    def run(self, stages, force=()):
+        """
+        Run stages in order, skipping those that are up to date
+
+        Args:
+            stages: List of Stage objects (each may read earlier outputs)
+            force: Stage names to run regardless of fingerprints
+
+        Returns:
+            True if every stage succeeded or was skipped
+        """
+        for stage in stages:
+            missing = [p for p in stage.inputs if not p.exists()]
+            if missing:
+                print(f"[ERROR] {stage.name}: missing input {missing[0]}")
+                return False
+
+            if stage.name not in force and self.is_fresh(stage):
+                print(f"[SKIP] {stage.name}: inputs unchanged")
+                continue
+
+            print(f"\n[RUN] {stage.name}")
+            fingerprint = self.fingerprint(stage)
+            if not stage.run(**stage.params):
+                print(f"[ERROR] Stage failed: {stage.name}")
+                return False
+
+            self.manifest['stages'][stage.name] = {
+                'fingerprint': fingerprint,
+                'outputs': {str(p): self.file_hash(p) for p in stage.outputs},
+            }
+            self._save()
+
+        return True
+
+
+def default_stages():
+    """The standard data_preprocessing -> generate_embeddings -> faiss_store -> topics chain (+ bundle)"""
+    from services.data_preprocessing import preprocess_kcc_data
+    from services.generate_embeddings import generate_embeddings
+    from services.faiss_store import create_faiss_index
+    from services.topic_clusters import build_topics
+    from services.compressed_io import find_input
+
+    services_dir = Path(__file__).parent
+    # The raw dump may only exist compressed (raw_kcc.csv.zst/.gz/.bz2)
+    raw_input = find_input(RAW_DATA_FILE)
+    index_outputs = [FAISS_INDEX_FILE, METADATA_FILE]
+    if INDEX_MODE == 'binary':
+        # A missing ids file is recorded as such, so a stale copy also triggers a rebuild
+        index_outputs += [BINARY_INDEX_FILE, VECTORS_FILE, VECTOR_IDS_FILE]
+    stages = [
+        Stage(
+            'preprocess', preprocess_kcc_data,
+            inputs=[raw_input], outputs=[CLEAN_DATA_FILE, QA_PAIRS_FILE],
+            params={'input_file': raw_input, 'output_csv': CLEAN_DATA_FILE,
+                    'output_json': QA_PAIRS_FILE},
+            sources=[services_dir / 'data_preprocessing.py', services_dir / 'qa_store.py'],
+        ),
+        Stage(
+            'embeddings', generate_embeddings,
+            inputs=[QA_PAIRS_FILE], outputs=[EMBEDDINGS_FILE],
+            params={'input_json': QA_PAIRS_FILE, 'output_pickle': EMBEDDINGS_FILE,
+                    'model_name': SENTENCE_TRANSFORMER_MODEL},
+            sources=[services_dir / 'generate_embeddings.py', services_dir / 'qa_store.py'],
+        ),
+        Stage(
+            'index', create_faiss_index,
+            inputs=[EMBEDDINGS_FILE], outputs=index_outputs,
+            params={'embeddings_file': EMBEDDINGS_FILE, 'index_file': FAISS_INDEX_FILE,
+                    'metadata_file': METADATA_FILE},
+            config={'dimension': EMBEDDING_DIMENSION, 'index_mode': INDEX_MODE,
+                    'pca_dimension': PCA_DIMENSION},
+            sources=[services_dir / 'faiss_store.py'],
+        ),
+        Stage(
+            'topics', build_topics,
+            inputs=[FAISS_INDEX_FILE, METADATA_FILE], outputs=[TOPICS_FILE, TOPIC_CENTROIDS_FILE],
+            params={'index_file': FAISS_INDEX_FILE, 'metadata_file': METADATA_FILE,
+                    'topics_file': TOPICS_FILE, 'centroids_file': TOPIC_CENTROIDS_FILE,
+                    'num_topics': NUM_TOPICS},
+            sources=[services_dir / 'topic_clusters.py'],
+        ),
+    ]
+    if USE_KB_BUNDLE:
+        from services.kb_bundle import write_bundle
+        stages.append(Stage(
+            'bundle', write_bundle,
+            inputs=[FAISS_INDEX_FILE, METADATA_FILE], outputs=[KB_BUNDLE_FILE],
+            params={'bundle_file': KB_BUNDLE_FILE, 'index_file': FAISS_INDEX_FILE,
+                    'metadata_file': METADATA_FILE, 'binary': INDEX_MODE == 'binary'},
+            sources=[services_dir / 'kb_bundle.py'],
+        ))
+    return stages
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Kisan Call Centre - Build Pipeline")
+    print("=" * 60)
+
+    # Usage: python build_pipeline.py [--force STAGE ...]
+    force = sys.argv[sys.argv.index('--force') + 1:] if '--force' in sys.argv else ()
+
+    success = PipelineRunner().run(default_stages(), force=force)
+
+    if success:
+        print("\n[SUCCESS] Build pipeline completed successfully!")
+    else:
+        print("\n[ERROR] Build pipeline failed!")
+        sys.exit(1)
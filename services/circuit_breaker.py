@@ -0,0 +1,148 @@
+"""
+Circuit Breaker Module
+Stops calling the LLM while it is failing or very slow, so queries get
+their offline answer at once instead of waiting for each call to fail
+"""
+
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+from config import (
+    LLM_BREAKER_WINDOW, LLM_BREAKER_MIN_CALLS, LLM_BREAKER_FAILURE_RATE, LLM_BREAKER_SLOW_CALL,
+    LLM_BREAKER_SLOW_RATE, LLM_BREAKER_OPEN_SECONDS
+)
+from services.llm_limiter import LLMUnavailableError
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(LLMUnavailableError):
+    """The breaker is open: the LLM is skipped until it recovers"""
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker over a sliding window of LLM calls
+
+    Closed: calls go through; the breaker opens when, over the last
+    `window` calls (and at least `min_calls`), the failure rate or the
+    slow-call rate reaches its threshold. Open: calls are refused for
+    `open_seconds`. Half-open: one probe call is let through; success
+    closes the breaker, failure (or a slow call) opens it again.
+    """
+
+    def __init__(self, window=LLM_BREAKER_WINDOW, min_calls=LLM_BREAKER_MIN_CALLS,
+                 failure_rate=LLM_BREAKER_FAILURE_RATE, slow_call=LLM_BREAKER_SLOW_CALL,
+                 slow_rate=LLM_BREAKER_SLOW_RATE, open_seconds=LLM_BREAKER_OPEN_SECONDS):
+        """
+        Args:
+            window: Recent calls the rates are computed over
+            min_calls: Calls needed in the window before the breaker can open
+            failure_rate: Fraction of failed calls that opens the breaker
+            slow_call: Seconds after which a successful call counts as slow
+            slow_rate: Fraction of slow calls that opens the breaker
+            open_seconds: How long the breaker stays open before a probe
+        """
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call = slow_call
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self._outcomes = deque(maxlen=window)   # (failed, slow) per call
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def _current_state(self, now):
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def _open(self, now):
+        self._state = OPEN
+        self._opened_at = now
+        self._probing = False
+        self._outcomes.clear()
+        self.opened += 1
+
+    def allow(self):
+        """
+        Admit a call, or raise CircuitOpenError
+
+        Every admitted call must be followed by record().
+        """
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            self.rejected += 1
+            retry_in = max(0.0, self._opened_at + self.open_seconds - now)
+            raise CircuitOpenError(f"LLM circuit {state}: skipping the call (retry in {retry_in:.0f}s)")
+
+    def record(self, seconds, failed):
+        """
+        Outcome of an admitted call
+
+        Args:
+            seconds: Call latency
+            failed: True for an upstream failure, False for success, None for
+                    an outcome that says nothing about upstream health (the
+                    call was cancelled, or the request itself was invalid)
+        """
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            if failed is None:
+                if state == HALF_OPEN:
+                    self._probing = False
+                return
+            slow = not failed and seconds >= self.slow_call
+            if state == HALF_OPEN:
+                if failed or slow:
+                    self._open(now)
+                else:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                return
+            if state == OPEN:
+                return
+            self._outcomes.append((failed, slow))
+            calls = len(self._outcomes)
+            if calls >= self.min_calls:
+                failures = sum(f for f, _ in self._outcomes)
+                slows = sum(s for _, s in self._outcomes)
+                if failures / calls >= self.failure_rate or slows / calls >= self.slow_rate:
+                    self._open(now)
+
+    def stats(self):
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            calls = len(self._outcomes)
+            return {
+                'state': state,
+                'window_calls': calls,
+                'failure_rate': round(sum(f for f, _ in self._outcomes) / calls, 2) if calls else 0.0,
+                'slow_rate': round(sum(s for _, s in self._outcomes) / calls, 2) if calls else 0.0,
+                'opened': self.opened,
+                'rejected': self.rejected,
+            }
@@ -0,0 +1,69 @@
+"""
+Compressed Input Module
+Streaming readers for plain, gzip, bzip2 and zstandard KCC dumps
+"""
+
+import bz2
+import gzip
+import io
+from pathlib import Path
+
+# Suffixes tried, in order, when looking for a dump on disk
+COMPRESSED_SUFFIXES = ['.zst', '.gz', '.bz2']
+
+
+def compression_of(path):
+    """Codec name for a path ('gzip', 'bz2', 'zstd') or None if uncompressed"""
+    suffix = Path(path).suffix.lower()
+    return {'.gz': 'gzip', '.bz2': 'bz2', '.zst': 'zstd'}.get(suffix)
+
+
+def find_input(path):
+    """
+    Resolve a dump path, falling back to a compressed copy next to it
+
+    Returns path itself if it exists, else the first of path.zst/.gz/.bz2
+    that exists, else path unchanged.
+    """
+    path = Path(path)
+    if path.exists():
+        return path
+    for suffix in COMPRESSED_SUFFIXES:
+        candidate = path.with_name(path.name + suffix)
+        if candidate.exists():
+            return candidate
+    return path
+
+
+def open_binary(path):
+    """Open a file for streaming binary reads, decompressing by suffix"""
+    codec = compression_of(path)
+    if codec == 'gzip':
+        return gzip.open(path, 'rb')
+    if codec == 'bz2':
+        return bz2.open(path, 'rb')
+    if codec == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError(
+                "zstandard library not installed (needed for .zst dumps). "
+                "Run: pip install zstandard"
+            )
+        raw = open(path, 'rb')
+        # Large read size keeps the decompressor out of the per-line hot path
+        return io.BufferedReader(
+            zstandard.ZstdDecompressor().stream_reader(raw, read_size=1 << 20, closefd=True),
+            buffer_size=1 << 20,
+        )
+    return open(path, 'rb')
+
+
+def open_text(path, encoding='utf-8', errors='replace', newline=None):
+    """
+    Open a file for streaming text reads, decompressing by suffix
+
+    Text semantics (decoding errors, universal newlines) are the same as the
+    built-in open(), so csv readers see identical rows for every codec.
+    """
+    return io.TextIOWrapper(open_binary(path), encoding=encoding, errors=errors, newline=newline)
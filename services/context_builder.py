@@ -0,0 +1,114 @@
+"""
+Prompt Context Builder Module
+Turns retrieved Q&A pairs into a prompt context that fits a token budget
+"""
+
+import re
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+from config import PROMPT_CONTEXT_TOKEN_BUDGET, PROMPT_MAX_ANSWER_TOKENS
+from services.near_dedup import NearDuplicateFilter
+
+# Sentence ends: Latin punctuation and the Devanagari danda
+_SENTENCE_RE = re.compile(r'(?<=[.!?।])\s+')
+
+# Below this many tokens of room, a truncated extra pair is not worth adding
+_MIN_PAIR_TOKENS = 24
+
+
+def estimate_tokens(text):
+    """
+    Rough token count without a tokenizer
+
+    ~4 characters per token for Latin script; Indic scripts split into
+    more tokens (~2 characters each), which matters for Hindi answers.
+    """
+    ascii_chars = sum(1 for ch in text if ch < '\x80')
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars + 1) // 2
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut text to about max_tokens, at a sentence boundary when possible"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    kept = []
+    used = 0
+    for sentence in _SENTENCE_RE.split(text):
+        cost = estimate_tokens(sentence) + 1
+        if used + cost > max_tokens:
+            break
+        kept.append(sentence)
+        used += cost
+    if kept:
+        return ' '.join(kept)
+    # First sentence alone is too long (KCC answers often lack punctuation): cut at a word
+    words = []
+    for word in text.split():
+        used_next = estimate_tokens(' '.join(words + [word]))
+        if used_next > max_tokens - 1:
+            break
+        words.append(word)
+    return ' '.join(words) + ' …'
+
+
+def build_context(qa_pairs, token_budget=PROMPT_CONTEXT_TOKEN_BUDGET, max_answer_tokens=PROMPT_MAX_ANSWER_TOKENS):
+    """
+    Numbered Q/A context for the prompt, within token_budget
+
+    Pairs are taken in retrieval (relevance) order. Answers that nearly
+    repeat an earlier one are dropped, long answers are cut to
+    max_answer_tokens, and the last pair that fits is truncated to the
+    remaining room (or dropped if even truncated it does not fit), so the
+    context never exceeds token_budget.
+
+    Returns:
+        (context string, stats dict with pairs_in/pairs_used/duplicates/
+        truncated/tokens)
+    """
+    dedup = NearDuplicateFilter()
+    parts = []
+    used = 0
+    duplicates = truncated = 0
+
+    for qa in qa_pairs:
+        question = qa.get('question', '').strip()
+        answer = qa.get('answer', '').strip()
+        if answer and dedup.is_duplicate(answer):
+            duplicates += 1
+            continue
+
+        # Entries after the first are joined by a blank line (~1 token)
+        separator = 1 if parts else 0
+        question = truncate_to_tokens(question, max_answer_tokens // 2)
+        short = truncate_to_tokens(answer, max_answer_tokens)
+        entry = f"{len(parts) + 1}. Q: {question}\n   A: {short}"
+        cost = estimate_tokens(entry) + separator
+        room = token_budget - used
+        if cost > room:
+            if room < _MIN_PAIR_TOKENS:
+                break
+            # Give the question at most half the room, the answer the rest
+            question = truncate_to_tokens(question, room // 2)
+            short = truncate_to_tokens(short, room - estimate_tokens(question) - 8)
+            entry = f"{len(parts) + 1}. Q: {question}\n   A: {short}"
+            cost = estimate_tokens(entry) + separator
+            if cost > room:
+                break
+        if short != answer:
+            truncated += 1
+        parts.append(entry)
+        used += cost
+        if used >= token_budget:
+            break
+
+    stats = {
+        'pairs_in': len(qa_pairs),
+        'pairs_used': len(parts),
+        'duplicates': duplicates,
+        'truncated': truncated,
+        'tokens': used,
+    }
+    return "\n\n".join(parts), stats
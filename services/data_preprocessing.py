@@ -11,7 +11,29 @@ import sys
 
 # Add parent directory to path for imports
 sys.path.append(str(Path(__file__).parent.parent))
-from config import RAW_DATA_FILE, CLEAN_DATA_FILE, QA_PAIRS_FILE
+from config import RAW_DATA_FILE, CLEAN_DATA_FILE, QA_PAIRS_FILE, QA_PAIRS_PARQUET_FILE
+from services.compressed_io import find_input
+from services.fingerprint_set import FingerprintSet
+from services.qa_store import ParquetQAWriter, is_parquet, save_qa_pairs
+
+# Columns cleaned as free text
+TEXT_COLUMNS = ['QueryText', 'KccAns', 'StateName', 'DistrictName',
+                'BlockName', 'Crop', 'QueryType', 'Category']
+
+# Columns read in chunked mode (everything else in the dump is ignored)
+KCC_COLUMNS = set(TEXT_COLUMNS) | {'Season'}
+
+# Low-cardinality columns stored as pandas categoricals in chunked mode
+CATEGORICAL_COLUMNS = ['StateName', 'DistrictName', 'BlockName', 'Crop',
+                       'QueryType', 'Category', 'Season']
+
+# Default rows per chunk for large dumps
+CHUNK_SIZE = 200_000
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Answers that are only a placeholder (NA, N/A, -, ...)
+_PLACEHOLDER_RE = re.compile(r'^(?:NA|N/A|-|\.+)$', re.IGNORECASE)
 
 
 def clean_text(text):
@@ -23,7 +45,7 @@ def clean_text(text):
     text = str(text)
     
     # Remove extra whitespace
-    text = re.sub(r'\s+', ' ', text)
+    text = _WHITESPACE_RE.sub(' ', text)
     
     # Strip leading/trailing whitespace
     text = text.strip()
@@ -31,6 +53,25 @@ def clean_text(text):
     return text
 
 
+def clean_text_series(series):
+    """
+    Vectorized clean_text for a whole column
+    
+    Args:
+        series: pandas Series of raw values
+        
+    Returns:
+        Series of cleaned strings (same result as series.apply(clean_text))
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Clean each distinct category once instead of every row
+        return series.map(clean_text).astype(object).fillna('')
+    
+    missing = series.isna()
+    cleaned = series.astype(str).str.replace(_WHITESPACE_RE, ' ', regex=True).str.strip()
+    return cleaned.mask(missing, '')
+
+
 def is_valid_qa_pair(query, answer):
     """Validate if Q&A pair is meaningful"""
     # Check if both query and answer exist
@@ -42,29 +83,193 @@ def is_valid_qa_pair(query, answer):
         return False
     
     # Check if answer is not just a placeholder
-    placeholder_patterns = [
-        r'^NA$',
-        r'^N/A$',
-        r'^-$',
-        r'^\.+$',
+    if _PLACEHOLDER_RE.match(answer.strip()):
+        return False
+    
+    return True
+
+
+def valid_qa_mask(queries, answers):
+    """
+    Vectorized is_valid_qa_pair over cleaned query/answer columns
+    
+    Args:
+        queries: Series of cleaned query strings
+        answers: Series of cleaned answer strings
+        
+    Returns:
+        Boolean numpy array, True where the pair is valid
+    """
+    mask = (queries.str.len() >= 10) & (answers.str.len() >= 10)
+    mask &= ~answers.str.strip().str.match(_PLACEHOLDER_RE)
+    return mask.to_numpy(dtype=bool)
+
+
+def extract_qa_pairs(df):
+    """
+    Build Q&A pair dicts from a cleaned DataFrame
+    
+    Args:
+        df: DataFrame with cleaned KCC columns
+        
+    Returns:
+        List of Q&A pair dicts
+    """
+    if 'QueryText' not in df.columns or 'KccAns' not in df.columns:
+        return []
+    
+    valid = df[valid_qa_mask(df['QueryText'], df['KccAns'])]
+    
+    def column(name):
+        if name in valid.columns:
+            return valid[name].tolist()
+        return [''] * len(valid)
+    
+    return [
+        {
+            'question': query,
+            'answer': answer,
+            'metadata': {
+                'state': state,
+                'district': district,
+                'crop': crop,
+                'category': category,
+                'query_type': query_type,
+                'season': season,
+            }
+        }
+        for query, answer, state, district, crop, category, query_type, season in zip(
+            column('QueryText'), column('KccAns'), column('StateName'),
+            column('DistrictName'), column('Crop'), column('Category'),
+            column('QueryType'), column('Season'),
+        )
     ]
+
+
+def _write_json_items(f, items, first):
+    """Append items to an open JSON array, matching json.dump(indent=2) layout"""
+    for item in items:
+        body = json.dumps(item, ensure_ascii=False, indent=2).replace('\n', '\n  ')
+        f.write(('\n  ' if first else ',\n  ') + body)
+        first = False
+    return first
+
+
+def preprocess_kcc_data_chunked(input_file=RAW_DATA_FILE, output_csv=CLEAN_DATA_FILE,
+                                output_json=QA_PAIRS_FILE, chunksize=CHUNK_SIZE):
+    """
+    Preprocess a large KCC dump without loading it into memory
+    
+    Reads only the KCC columns in chunks, removes duplicates across chunks
+    using a FingerprintSet of 64-bit row hashes, and appends each chunk's output to the cleaned
+    CSV and Q&A JSON as it goes. Peak memory is bounded by the chunk size
+    plus 8 bytes per unique row.
+    
+    Args:
+        input_file: Path to raw CSV file (.gz/.bz2/.zst are decompressed on the fly)
+        output_csv: Path to save cleaned CSV
+        output_json: Path to save Q&A pairs (JSON, or Parquet if it ends in .parquet)
+        chunksize: Rows per chunk
+    """
+    input_file = find_input(input_file)
+    print(f"[INFO] Streaming data from: {input_file} (chunksize={chunksize:,})")
+    
+    if not Path(input_file).exists():
+        print(f"[ERROR] File not found - {input_file}")
+        print("Please place the raw_kcc.csv file in the data/ directory")
+        return False
+    
+    reader = pd.read_csv(
+        input_file,
+        encoding='utf-8',
+        encoding_errors='replace',
+        usecols=lambda c: c.strip() in KCC_COLUMNS,
+        dtype={c: 'category' for c in CATEGORICAL_COLUMNS},
+        chunksize=chunksize,
+    )
     
-    for pattern in placeholder_patterns:
-        if re.match(pattern, answer.strip(), re.IGNORECASE):
-            return False
+    seen_hashes = FingerprintSet()
+    crops = set()
+    states = set()
+    total_records = 0
+    kept_records = 0
+    num_pairs = 0
+    first_item = True
+    
+    if is_parquet(output_json):
+        qa_out = ParquetQAWriter(output_json)
+    else:
+        qa_out = open(output_json, 'w', encoding='utf-8')
+        qa_out.write('[')
+    
+    try:
+        for chunk_no, df in enumerate(reader):
+            total_records += len(df)
+            df.columns = df.columns.str.strip()
+            
+            for col in TEXT_COLUMNS:
+                if col in df.columns:
+                    df[col] = clean_text_series(df[col])
+            
+            # Deduplicate within the chunk and against every earlier chunk
+            row_hashes = pd.util.hash_pandas_object(
+                df[['QueryText', 'KccAns']], index=False
+            ).to_numpy()
+            df = df[seen_hashes.add_many(row_hashes)]
+            kept_records += len(df)
+            
+            if 'Crop' in df.columns:
+                crops.update(df['Crop'].unique())
+            if 'StateName' in df.columns:
+                states.update(df['StateName'].unique())
+            
+            df.to_csv(output_csv, mode='w' if chunk_no == 0 else 'a',
+                      header=chunk_no == 0, index=False, encoding='utf-8')
+            
+            qa_pairs = extract_qa_pairs(df)
+            if isinstance(qa_out, ParquetQAWriter):
+                qa_out.write(qa_pairs)
+            else:
+                first_item = _write_json_items(qa_out, qa_pairs, first_item)
+            num_pairs += len(qa_pairs)
+            
+            print(f"  ... processed {total_records:,} rows, kept {kept_records:,}, "
+                  f"extracted {num_pairs:,} pairs")
+        
+        if not isinstance(qa_out, ParquetQAWriter):
+            qa_out.write('\n]' if not first_item else ']')
+    finally:
+        qa_out.close()
+    
+    print(f"[INFO] Removed {total_records - kept_records} duplicate records")
+    print(f"[SUCCESS] Saved cleaned data to: {output_csv}")
+    print(f"[SUCCESS] Saved Q&A pairs to: {output_json}")
+    
+    print("\n[INFO] Data Statistics:")
+    print(f"  Total records: {kept_records}")
+    print(f"  Valid Q&A pairs: {num_pairs}")
+    print(f"  Unique crops: {len(crops) if crops else 'N/A'}")
+    print(f"  Unique states: {len(states) if states else 'N/A'}")
     
     return True
 
 
-def preprocess_kcc_data(input_file=RAW_DATA_FILE, output_csv=CLEAN_DATA_FILE, output_json=QA_PAIRS_FILE):
+def preprocess_kcc_data(input_file=RAW_DATA_FILE, output_csv=CLEAN_DATA_FILE, output_json=QA_PAIRS_FILE,
+                        chunksize=None):
     """
     Preprocess Kisan Call Centre dataset
     
     Args:
-        input_file: Path to raw CSV file
+        input_file: Path to raw CSV file (.gz/.bz2/.zst are decompressed on the fly)
         output_csv: Path to save cleaned CSV
-        output_json: Path to save Q&A pairs JSON
+        output_json: Path to save Q&A pairs (JSON, or Parquet if it ends in .parquet)
+        chunksize: If set, stream the file in chunks of this many rows
+                   (see preprocess_kcc_data_chunked)
     """
+    if chunksize:
+        return preprocess_kcc_data_chunked(input_file, output_csv, output_json, chunksize)
+    
+    input_file = find_input(input_file)
     print(f"[INFO] Loading data from: {input_file}")
     
     # Check if file exists
@@ -87,12 +292,9 @@ def preprocess_kcc_data(input_file=RAW_DATA_FILE, output_csv=CLEAN_DATA_FILE, ou
     
     # Clean text fields
     print("[INFO] Cleaning text fields...")
-    text_columns = ['QueryText', 'KccAns', 'StateName', 'DistrictName', 
-                    'BlockName', 'Crop', 'QueryType', 'Category']
-    
-    for col in text_columns:
+    for col in TEXT_COLUMNS:
         if col in df.columns:
-            df[col] = df[col].apply(clean_text)
+            df[col] = clean_text_series(df[col])
     
     # Remove duplicates
     initial_count = len(df)
@@ -102,26 +304,7 @@ def preprocess_kcc_data(input_file=RAW_DATA_FILE, output_csv=CLEAN_DATA_FILE, ou
     
     # Extract Q&A pairs
     print("[INFO] Extracting Q&A pairs...")
-    qa_pairs = []
-    
-    for idx, row in df.iterrows():
-        query = row.get('QueryText', '')
-        answer = row.get('KccAns', '')
-        
-        if is_valid_qa_pair(query, answer):
-            qa_pair = {
-                'question': query,
-                'answer': answer,
-                'metadata': {
-                    'state': row.get('StateName', ''),
-                    'district': row.get('DistrictName', ''),
-                    'crop': row.get('Crop', ''),
-                    'category': row.get('Category', ''),
-                    'query_type': row.get('QueryType', ''),
-                    'season': row.get('Season', ''),
-                }
-            }
-            qa_pairs.append(qa_pair)
+    qa_pairs = extract_qa_pairs(df)
     
     print(f"[SUCCESS] Extracted {len(qa_pairs)} valid Q&A pairs")
     
@@ -130,8 +313,7 @@ def preprocess_kcc_data(input_file=RAW_DATA_FILE, output_csv=CLEAN_DATA_FILE, ou
     print(f"[SUCCESS] Saved cleaned data to: {output_csv}")
     
     # Save Q&A pairs as JSON
-    with open(output_json, 'w', encoding='utf-8') as f:
-        json.dump(qa_pairs, f, ensure_ascii=False, indent=2)
+    save_qa_pairs(qa_pairs, output_json)
     print(f"[SUCCESS] Saved Q&A pairs to: {output_json}")
     
     # Print statistics
@@ -149,7 +331,16 @@ if __name__ == "__main__":
     print("Kisan Call Centre - Data Preprocessing")
     print("=" * 60)
     
-    success = preprocess_kcc_data()
+    # Usage: python data_preprocessing.py [--chunked [ROWS]] [--parquet]
+    chunksize = None
+    if '--chunked' in sys.argv:
+        pos = sys.argv.index('--chunked')
+        next_arg = sys.argv[pos + 1] if len(sys.argv) > pos + 1 else ''
+        chunksize = int(next_arg) if next_arg.isdigit() else CHUNK_SIZE
+    
+    output_json = QA_PAIRS_PARQUET_FILE if '--parquet' in sys.argv else QA_PAIRS_FILE
+    
+    success = preprocess_kcc_data(output_json=output_json, chunksize=chunksize)
     
     if success:
         print("\n[SUCCESS] Data preprocessing completed successfully!")
@@ -3,7 +3,9 @@ FAISS Vector Store Module
 Creates and manages FAISS index for semantic search
 """
 
+import hashlib
 import pickle
+from collections.abc import Mapping
 import numpy as np
 import faiss
 from pathlib import Path
@@ -11,7 +13,150 @@ import sys
 
 # Add parent directory to path for imports
 sys.path.append(str(Path(__file__).parent.parent))
-from config import EMBEDDINGS_FILE, FAISS_INDEX_FILE, METADATA_FILE, EMBEDDING_DIMENSION
+from config import (
+    EMBEDDINGS_FILE, FAISS_INDEX_FILE, METADATA_FILE, EMBEDDING_DIMENSION, PCA_DIMENSION,
+    INDEX_MODE, BINARY_INDEX_FILE, VECTORS_FILE, VECTOR_IDS_FILE, BINARY_CANDIDATES,
+    KB_BUNDLE_FILE, USE_KB_BUNDLE
+)
+
+
+def build_index(embeddings_array, pca_dimension=PCA_DIMENSION):
+    """
+    Build an exact L2 index, optionally behind a learned PCA projection
+    
+    Args:
+        embeddings_array: float32 array of shape (n, dimension)
+        pca_dimension: Reduce vectors to this many dimensions first (0 = off).
+                       The transform is stored in the index, so searches
+                       apply it to queries automatically.
+        
+    Returns:
+        Trained FAISS index containing all vectors
+    """
+    dimension = embeddings_array.shape[1]
+    
+    if pca_dimension and pca_dimension < dimension:
+        pca = faiss.PCAMatrix(dimension, pca_dimension)
+        index = faiss.IndexPreTransform(pca, faiss.IndexFlatL2(pca_dimension))
+        print(f"[INFO] Training PCA {dimension} -> {pca_dimension} on {len(embeddings_array)} vectors...")
+        index.train(embeddings_array)
+    else:
+        # Use IndexFlatL2 for exact search (good for small to medium datasets)
+        index = faiss.IndexFlatL2(dimension)
+    
+    index.add(embeddings_array)
+    return index
+
+
+def binarize(vectors):
+    """Sign bits of each component, packed 8 per byte (384-d -> 48 bytes)"""
+    return np.packbits(np.asarray(vectors) > 0, axis=1)
+
+
+class BinaryRerankIndex:
+    """
+    Two-stage index: Hamming scan over sign bits, then exact L2 re-ranking
+    
+    Stage one scans a binary index (d/8 bytes per vector, 32x smaller than
+    float32) for the nearest `candidates` codes. Stage two re-scores only
+    those rows against the float vectors, which are memory-mapped so they
+    stay on disk until touched. search() mirrors faiss: (distances, ids).
+    """
+    
+    def __init__(self, binary_index, vectors, ids=None, candidates=BINARY_CANDIDATES):
+        """
+        Args:
+            binary_index: faiss.IndexBinaryFlat over binarize(vectors)
+            vectors: float32 array (or memmap) of shape (n, dimension)
+            ids: Optional int64 array mapping row -> stable id
+            candidates: Number of Hamming neighbours re-ranked per query
+        """
+        self.binary_index = binary_index
+        self.vectors = vectors
+        self.ids = ids
+        self.candidates = candidates
+    
+    @property
+    def ntotal(self):
+        return self.binary_index.ntotal
+    
+    @classmethod
+    def load(cls, binary_file=BINARY_INDEX_FILE, vectors_file=VECTORS_FILE,
+             ids_file=VECTOR_IDS_FILE, candidates=BINARY_CANDIDATES):
+        binary_index = faiss.read_index_binary(str(binary_file))
+        vectors = np.load(vectors_file, mmap_mode='r')
+        ids = np.load(ids_file) if Path(ids_file).exists() else None
+        return cls(binary_index, vectors, ids, candidates)
+    
+    def search(self, queries, k):
+        queries = np.asarray(queries, dtype='float32')
+        num_candidates = min(max(self.candidates, k), self.ntotal)
+        _, candidates = self.binary_index.search(binarize(queries), num_candidates)
+        
+        distances = np.full((len(queries), k), np.inf, dtype='float32')
+        labels = np.full((len(queries), k), -1, dtype='int64')
+        for row, (query, rows) in enumerate(zip(queries, candidates)):
+            # Sorted row order keeps memory-mapped reads sequential
+            rows = np.sort(rows[rows >= 0])
+            exact = ((self.vectors[rows] - query) ** 2).sum(axis=1)
+            best = np.argsort(exact)[:k]
+            distances[row, :len(best)] = exact[best]
+            labels[row, :len(best)] = self.ids[rows[best]] if self.ids is not None else rows[best]
+        return distances, labels
+
+
+def reconstruct_vectors(loaded):
+    """
+    (vectors, ids) stored in a plain or id-mapped (IndexIDMap2) index
+
+    ids is None for plain indexes, whose labels are row positions.
+    Tombstoned ids are included; callers drop those without metadata.
+    """
+    # Keep the loaded index referenced: downcast wrappers do not own it
+    index = faiss.downcast_index(loaded)
+    if isinstance(index, faiss.IndexIDMap2):
+        vectors = faiss.downcast_index(index.index).reconstruct_n(0, index.ntotal)
+        return vectors, faiss.vector_to_array(index.id_map)
+    return index.reconstruct_n(0, index.ntotal), None
+
+
+def write_binary_index(vectors, ids=None, binary_file=BINARY_INDEX_FILE,
+                       vectors_file=VECTORS_FILE, ids_file=VECTOR_IDS_FILE):
+    """
+    Save the files BinaryRerankIndex.load() reads
+    
+    Args:
+        vectors: float32 array of shape (n, dimension)
+        ids: Optional stable ids per row (written only for id-mapped indexes)
+    """
+    vectors = np.ascontiguousarray(vectors, dtype='float32')
+    binary_index = faiss.IndexBinaryFlat(vectors.shape[1])
+    binary_index.add(binarize(vectors))
+    
+    Path(binary_file).parent.mkdir(parents=True, exist_ok=True)
+    faiss.write_index_binary(binary_index, str(binary_file))
+    np.save(vectors_file, vectors)
+    if ids is not None:
+        np.save(ids_file, np.asarray(ids, dtype='int64'))
+    elif Path(ids_file).exists():
+        Path(ids_file).unlink()
+    
+    print(f"[SUCCESS] Binary index saved to: {binary_file} "
+          f"({Path(binary_file).stat().st_size / (1024*1024):.2f} MB, "
+          f"float vectors {Path(vectors_file).stat().st_size / (1024*1024):.2f} MB on disk)")
+
+
+def create_binary_index(index_file=FAISS_INDEX_FILE):
+    """
+    Derive the binary index files from an existing float index
+    
+    Works for plain and id-mapped (incrementally updated) indexes. Vectors
+    behind a PCA pre-transform come back approximately, so build with
+    pca_dimension=0 when using binary mode.
+    """
+    vectors, ids = reconstruct_vectors(faiss.read_index(str(index_file)))
+    write_binary_index(vectors, ids)
+    return True
 
 
 def create_faiss_index(
@@ -59,11 +204,7 @@ def create_faiss_index(
     print("[INFO] Creating FAISS index...")
     dimension = embeddings_array.shape[1]
     
-    # Use IndexFlatL2 for exact search (good for small to medium datasets)
-    index = faiss.IndexFlatL2(dimension)
-    
-    # Add vectors to index
-    index.add(embeddings_array)
+    index = build_index(embeddings_array)
     
     print(f"[SUCCESS] FAISS index created with {index.ntotal} vectors")
     
@@ -75,6 +216,9 @@ def create_faiss_index(
     faiss.write_index(index, str(index_file))
     print(f"[SUCCESS] FAISS index saved to: {index_file}")
     
+    if INDEX_MODE == 'binary':
+        write_binary_index(embeddings_array)
+    
     # Save metadata
     print("[INFO] Saving metadata...")
     with open(metadata_file, "wb") as f:
@@ -94,28 +238,58 @@ def create_faiss_index(
 class FAISSSearcher:
     """FAISS-based semantic search"""
     
-    def __init__(self, index_file=FAISS_INDEX_FILE, metadata_file=METADATA_FILE):
-        """Initialize FAISS searcher"""
+    def __init__(self, index_file=FAISS_INDEX_FILE, metadata_file=METADATA_FILE, index_mode=INDEX_MODE,
+                 bundle_file=KB_BUNDLE_FILE if USE_KB_BUNDLE else None):
+        """
+        Initialize FAISS searcher
+        
+        Args:
+            index_mode: 'flat' searches the float index; 'binary' uses the
+                        Hamming + re-rank index written by write_binary_index
+            bundle_file: Load index and metadata from this single-file bundle
+                         (services/kb_bundle.py) instead of the loose files
+        """
         self.index_file = index_file
         self.metadata_file = metadata_file
+        self.index_mode = index_mode
+        self.bundle_file = bundle_file
+        self.bundle = None
+        self.kb_version = None
         self.index = None
         self.metadata = None
         self.model = None
+        self.num_tombstones = 0
         
     def load(self):
         """Load FAISS index and metadata"""
         # Load FAISS index
-        if not Path(self.index_file).exists():
-            raise FileNotFoundError(f"FAISS index not found: {self.index_file}")
-        
-        self.index = faiss.read_index(str(self.index_file))
+        if self.bundle_file:
+            from services.kb_bundle import KBBundle
+            # Checksums are checked at deploy time (python kb_bundle.py verify), not on every start
+            self.bundle = KBBundle(self.bundle_file).open(verify=False)
+            self.index, self.metadata = self.bundle.index, self.bundle.metadata
+        elif self.index_mode == 'binary':
+            if not Path(BINARY_INDEX_FILE).exists():
+                raise FileNotFoundError(f"Binary index not found: {BINARY_INDEX_FILE} "
+                                        "(run: python faiss_store.py --binary)")
+            self.index = BinaryRerankIndex.load()
+        else:
+            if not Path(self.index_file).exists():
+                raise FileNotFoundError(f"FAISS index not found: {self.index_file}")
+            self.index = faiss.read_index(str(self.index_file))
         
         # Load metadata
-        if not Path(self.metadata_file).exists():
-            raise FileNotFoundError(f"Metadata file not found: {self.metadata_file}")
+        if self.bundle is None:
+            if not Path(self.metadata_file).exists():
+                raise FileNotFoundError(f"Metadata file not found: {self.metadata_file}")
+            
+            with open(self.metadata_file, "rb") as f:
+                self.metadata = pickle.load(f)
         
-        with open(self.metadata_file, "rb") as f:
-            self.metadata = pickle.load(f)
+        self.kb_version = self._kb_version()
+        
+        # Id-mapped index (see index_updater): vectors without metadata are retired
+        self.num_tombstones = max(0, self.index.ntotal - len(self.metadata))
         
         # Load sentence transformer model for query embedding
         from sentence_transformers import SentenceTransformer
@@ -125,7 +299,33 @@ class FAISSSearcher:
         
         return self
     
-    def search(self, query, top_k=5, max_distance=1.3):
+    def _kb_version(self):
+        """Short id of the loaded knowledge base; changes whenever it is rebuilt or updated"""
+        if self.bundle is not None:
+            parts = [str(info['crc32']) for _, info in sorted(self.bundle.header['sections'].items())]
+        else:
+            paths = [self.index_file, self.metadata_file]
+            if self.index_mode == 'binary':
+                paths += [BINARY_INDEX_FILE, VECTORS_FILE, VECTOR_IDS_FILE]
+            parts = [f"{Path(p).stat().st_size}:{Path(p).stat().st_mtime_ns}" if Path(p).exists() else '-'
+                     for p in paths]
+        return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()[:16]
+    
+    def _lookup(self, idx):
+        """Metadata for a FAISS result id (list position, or stable id for dict metadata)"""
+        if isinstance(self.metadata, Mapping):
+            return self.metadata.get(int(idx))
+        if 0 <= idx < len(self.metadata):
+            return self.metadata[idx]
+        return None
+    
+    def embed(self, query):
+        """Query embedding as a (1, dimension) float32 array"""
+        if self.model is None:
+            raise RuntimeError("Searcher not loaded. Call load() first.")
+        return self.model.encode([query]).astype('float32')
+    
+    def search(self, query, top_k=5, max_distance=1.3, query_embedding=None):
         """
         Search for similar Q&A pairs
         
@@ -134,6 +334,7 @@ class FAISSSearcher:
             top_k: Number of results to return
             max_distance: Maximum L2 distance threshold. Results beyond this
                          are considered irrelevant and excluded. Default 1.5.
+            query_embedding: embed(query), if the caller already computed it
             
         Returns:
             List of dicts with distance, confidence, and metadata
@@ -142,28 +343,43 @@ class FAISSSearcher:
             raise RuntimeError("Searcher not loaded. Call load() first.")
         
         # Embed query
-        query_embedding = self.model.encode([query]).astype('float32')
+        if query_embedding is None:
+            query_embedding = self.embed(query)
         
-        # Search FAISS index
-        distances, indices = self.index.search(query_embedding, top_k)
+        # Id-mapped indexes may hold retired vectors (see index_updater): fetch
+        # a few extra, and widen only when too few live hits come back
+        max_k = top_k + self.num_tombstones
+        search_k = min(max_k, 2 * top_k)
+        while True:
+            results, exhausted = self._collect(query_embedding, search_k, top_k, max_distance)
+            if len(results) >= top_k or exhausted or search_k >= max_k:
+                return results
+            search_k = min(max_k, 4 * search_k)
+    
+    def _collect(self, query_embedding, search_k, top_k, max_distance):
+        """(up to top_k live results among the nearest search_k, whether widening cannot find more)"""
+        distances, indices = self.index.search(query_embedding, search_k)
         
         # Retrieve results with relevance filtering
         results = []
         for dist, idx in zip(distances[0], indices[0]):
-            if idx < len(self.metadata):
-                distance = float(dist)
-                # Skip results beyond max_distance threshold
-                if distance > max_distance:
-                    continue
-                # Compute confidence: 1.0 = perfect match, 0.0 = at threshold
-                confidence = max(0.0, 1.0 - (distance / max_distance))
-                results.append({
-                    'distance': distance,
-                    'confidence': round(confidence, 2),
-                    'metadata': self.metadata[idx]
-                })
-        
-        return results
+            distance = float(dist)
+            # Distances ascend: past max_distance (or the last vector), nothing further is relevant
+            if idx < 0 or distance > max_distance:
+                return results, True
+            metadata = self._lookup(idx)
+            if metadata is None:
+                continue
+            # Compute confidence: 1.0 = perfect match, 0.0 = at threshold
+            confidence = max(0.0, 1.0 - (distance / max_distance))
+            results.append({
+                'distance': distance,
+                'confidence': round(confidence, 2),
+                'metadata': metadata
+            })
+            if len(results) >= top_k:
+                break
+        return results, False
 
 
 if __name__ == "__main__":
@@ -171,6 +387,11 @@ if __name__ == "__main__":
     print("Kisan Call Centre - FAISS Index Creation")
     print("=" * 60)
     
+    # Usage: python faiss_store.py [--binary]
+    #   --binary  only derive the binary index files from the existing float index
+    if '--binary' in sys.argv:
+        sys.exit(0 if create_binary_index() else 1)
+    
     success = create_faiss_index()
     
     if success:
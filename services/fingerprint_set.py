@@ -0,0 +1,149 @@
+"""
+Fingerprint Set Module
+Compact set of 64-bit text fingerprints for large-scale deduplication
+"""
+
+import hashlib
+import os
+from pathlib import Path
+
+import numpy as np
+
+_EMPTY = np.uint64(0)
+
+
+def fingerprint(text):
+    """64-bit fingerprint of a string (never 0, which marks an empty slot)"""
+    value = int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+    return value or 1
+
+
+class FingerprintSet:
+    """
+    Open-addressing hash set of 64-bit fingerprints in a numpy array
+
+    Uses 8 bytes per slot and grows by doubling at max_load, so each stored
+    key costs 8-16 bytes instead of a full Python string. Two different
+    texts collide with probability ~len/2**64 per lookup, which is below
+    1e-9 even at a billion entries.
+
+    With spill_path set, the table lives in a memory-mapped file instead of
+    RAM, so the OS can page it out when the set outgrows physical memory.
+    """
+
+    def __init__(self, capacity=1 << 16, max_load=0.5, spill_path=None):
+        """
+        Initialize set
+
+        Args:
+            capacity: Initial number of slots (rounded up to a power of two)
+            max_load: Fill ratio at which the table doubles
+            spill_path: Optional file path to back the table with np.memmap
+        """
+        self.max_load = max_load
+        self.spill_path = Path(spill_path) if spill_path else None
+        self._generation = 0
+        self._size = 0
+        self._table = self._allocate(1 << max(4, int(capacity - 1).bit_length()))
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, key):
+        key = np.uint64(key or 1)
+        table = self._table
+        mask = len(table) - 1
+        slot = int(key) & mask
+        while True:
+            current = table[slot]
+            if current == key:
+                return True
+            if current == _EMPTY:
+                return False
+            slot = (slot + 1) & mask
+
+    @property
+    def nbytes(self):
+        """Size of the slot table in bytes"""
+        return self._table.nbytes
+
+    @property
+    def capacity(self):
+        return len(self._table)
+
+    def _allocate(self, slots):
+        if self.spill_path is None:
+            return np.zeros(slots, dtype=np.uint64)
+        path = f"{self.spill_path}.{self._generation}"
+        self._generation += 1
+        # A new memmap file is zero-filled (sparse on most filesystems)
+        return np.memmap(path, dtype=np.uint64, mode='w+', shape=(slots,))
+
+    def _release(self, table):
+        if isinstance(table, np.memmap):
+            path = table.filename
+            del table
+            os.remove(path)
+
+    def _grow(self):
+        """Double the table and re-insert every key (vectorized)"""
+        old = self._table
+        keys = np.asarray(old[old != _EMPTY])
+        table = self._allocate(len(old) * 2)
+        mask = np.uint64(len(table) - 1)
+
+        slots = keys & mask
+        while keys.size:
+            free = table[slots] == _EMPTY
+            # Among keys aiming at the same free slot the first one wins
+            winner_slots, first = np.unique(slots[free], return_index=True)
+            table[winner_slots] = keys[free][first]
+            placed = np.zeros(keys.size, dtype=bool)
+            placed[np.flatnonzero(free)[first]] = True
+            keys = keys[~placed]
+            slots = (slots[~placed] + np.uint64(1)) & mask
+
+        self._table = table
+        self._release(old)
+
+    def add(self, key):
+        """
+        Add a fingerprint
+
+        Returns:
+            True if the key was not present before
+        """
+        key = np.uint64(key or 1)
+        table = self._table
+        mask = len(table) - 1
+        slot = int(key) & mask
+        while True:
+            current = table[slot]
+            if current == key:
+                return False
+            if current == _EMPTY:
+                break
+            slot = (slot + 1) & mask
+
+        table[slot] = key
+        self._size += 1
+        if self._size > self.max_load * len(table):
+            self._grow()
+        return True
+
+    def add_many(self, keys):
+        """
+        Add an array of fingerprints
+
+        Returns:
+            Boolean numpy array, True where the key was newly added
+            (a key repeated within keys is new only the first time)
+        """
+        return np.fromiter((self.add(k) for k in np.asarray(keys, dtype=np.uint64).tolist()),
+                           dtype=bool, count=len(keys))
+
+    def close(self):
+        """Delete the spill file, if any"""
+        self._release(self._table)
+        self._table = np.zeros(16, dtype=np.uint64)
+        self._size = 0
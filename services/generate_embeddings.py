@@ -3,15 +3,66 @@ Embedding Generation Module
 Generates vector embeddings for Q&A pairs using Sentence Transformers
 """
 
-import json
 import pickle
+import time
 from pathlib import Path
 import sys
+import numpy as np
 from sentence_transformers import SentenceTransformer
 
 # Add parent directory to path for imports
 sys.path.append(str(Path(__file__).parent.parent))
 from config import QA_PAIRS_FILE, EMBEDDINGS_FILE, SENTENCE_TRANSFORMER_MODEL
+from services.qa_store import load_qa_pairs
+
+# Texts tokenized per call when measuring lengths for bucketing
+_LENGTH_CHUNK = 10000
+
+
+def encode_length_bucketed(model, texts, batch_size=32, show_progress_bar=True):
+    """
+    Encode texts in batches of similar token length
+    
+    Texts are sorted by token count so each batch pads only to the length of
+    its own longest member, then the embeddings are returned in input order.
+    
+    Args:
+        model: Loaded SentenceTransformer model
+        texts: List of strings to encode
+        batch_size: Number of texts per batch
+        show_progress_bar: Whether to print batch progress
+        
+    Returns:
+        numpy array of shape (len(texts), dimension)
+    """
+    if not texts:
+        return np.zeros((0, model.get_sentence_embedding_dimension()), dtype='float32')
+    
+    # Token lengths, capped at the model's window (longer texts are truncated anyway);
+    # tokenized in chunks so the id lists of the whole corpus are never held at once
+    max_len = model.max_seq_length or 512
+    lengths = np.empty(len(texts), dtype=np.int64)
+    for start in range(0, len(texts), _LENGTH_CHUNK):
+        token_ids = model.tokenizer(texts[start:start + _LENGTH_CHUNK], add_special_tokens=False,
+                                    truncation=True, max_length=max_len)['input_ids']
+        lengths[start:start + len(token_ids)] = [len(ids) for ids in token_ids]
+    
+    # Longest first so an out-of-memory batch fails immediately, not at the end
+    order = np.argsort(-lengths, kind='stable')
+    
+    chunks = []
+    num_batches = (len(texts) + batch_size - 1) // batch_size
+    for b in range(num_batches):
+        batch_idx = order[b * batch_size:(b + 1) * batch_size]
+        batch = [texts[i] for i in batch_idx]
+        chunks.append(model.encode(batch, batch_size=batch_size, show_progress_bar=False))
+        if show_progress_bar and ((b + 1) % 50 == 0 or b + 1 == num_batches):
+            print(f"  ... encoded batch {b + 1}/{num_batches}")
+    
+    # Restore original order
+    embeddings = np.empty((len(texts), chunks[0].shape[1]), dtype=chunks[0].dtype)
+    embeddings[order] = np.concatenate(chunks)
+    return embeddings
 
 
 def generate_embeddings(
@@ -23,7 +74,7 @@ def generate_embeddings(
     Generate embeddings for Q&A pairs
     
     Args:
-        input_json: Path to Q&A pairs JSON file
+        input_json: Path to Q&A pairs file (.json or .parquet)
         output_pickle: Path to save embeddings pickle file
         model_name: Name of the Sentence Transformer model
     """
@@ -35,9 +86,8 @@ def generate_embeddings(
         print("Please run data_preprocessing.py first")
         return False
     
-    # Load Q&A data
-    with open(input_json, "r", encoding="utf-8") as f:
-        qa_data = json.load(f)
+    # Load Q&A data (JSON or Parquet)
+    qa_data = load_qa_pairs(input_json)
     
     print(f"[SUCCESS] Loaded {len(qa_data)} Q&A pairs")
     
@@ -57,9 +107,12 @@ def generate_embeddings(
     # Generate embeddings
     print(f"[INFO] Generating embeddings for {len(texts)} texts...")
     print("   This may take a few minutes...")
-    embeddings = model.encode(texts, show_progress_bar=True, batch_size=32)
+    start = time.time()
+    embeddings = encode_length_bucketed(model, texts, batch_size=32)
+    elapsed = time.time() - start
     
     print(f"[SUCCESS] Generated embeddings with shape: {embeddings.shape}")
+    print(f"  Throughput: {len(texts) / max(elapsed, 1e-9):.1f} texts/sec ({elapsed:.1f}s)")
     
     # Save as a list of (embedding, metadata) tuples
     print("[INFO] Saving embeddings...")
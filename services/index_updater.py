@@ -0,0 +1,184 @@
+"""
+Incremental Index Module
+Adds, replaces and retires Q&A pairs in the FAISS index without a full rebuild
+"""
+
+import json
+import os
+import pickle
+import sys
+from pathlib import Path
+
+import numpy as np
+import faiss
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+from config import FAISS_INDEX_FILE, METADATA_FILE, SENTENCE_TRANSFORMER_MODEL, INDEX_MODE
+from services.fingerprint_set import fingerprint
+from services.qa_store import load_qa_pairs
+
+
+def pair_id(question):
+    """Stable 63-bit id of a Q&A pair (FAISS ids are signed, -1 means none)"""
+    return fingerprint(question.strip().lower()) & 0x7FFFFFFFFFFFFFFF
+
+
+def pair_text(qa):
+    """Text embedded for a pair (same format as rebuild_index)"""
+    return f"{qa['question']} {qa['answer']}"
+
+
+def _empty_like(index):
+    """Empty copy of an index, keeping any trained pre-transform (e.g. PCA)"""
+    empty = faiss.clone_index(index)
+    empty.reset()
+    return empty
+
+
+class IncrementalIndex:
+    """
+    FAISS index with stable ids and an id -> metadata store
+
+    The index is an IndexIDMap2 keyed by pair_id(question). meta.pkl holds
+    a dict {id: qa_pair}. Deleting a pair only drops its metadata, which
+    acts as a tombstone: FAISSSearcher skips ids without metadata.
+    compact() then removes tombstoned vectors from the index.
+    """
+
+    def __init__(self, index_file=FAISS_INDEX_FILE, metadata_file=METADATA_FILE):
+        self.index_file = Path(index_file)
+        self.metadata_file = Path(metadata_file)
+        self.index = None
+        self.metadata = None
+        self.model = None
+
+    def load(self):
+        """Load the index, converting a positional (legacy) index to stable ids"""
+        index = faiss.read_index(str(self.index_file))
+        with open(self.metadata_file, "rb") as f:
+            metadata = pickle.load(f)
+
+        if isinstance(metadata, dict):
+            self.index, self.metadata = faiss.downcast_index(index), metadata
+            return self
+
+        # Legacy layout: plain index whose row i matches metadata[i]
+        print(f"[INFO] Converting positional index ({index.ntotal} vectors) to stable ids")
+        vectors = index.reconstruct_n(0, index.ntotal)
+        self.index = faiss.IndexIDMap2(_empty_like(index))
+        self.metadata = {}
+        self.add_vectors(metadata, vectors)
+        return self
+
+    def _encode(self, qa_pairs):
+        if self.model is None:
+            from sentence_transformers import SentenceTransformer
+            self.model = SentenceTransformer(SENTENCE_TRANSFORMER_MODEL)
+        from services.generate_embeddings import encode_length_bucketed
+        texts = [pair_text(qa) for qa in qa_pairs]
+        return encode_length_bucketed(self.model, texts, batch_size=64)
+
+    def add_vectors(self, qa_pairs, vectors):
+        """
+        Add or replace pairs whose embeddings are already computed
+
+        Returns:
+            (added, replaced) counts
+        """
+        # Last occurrence wins when the batch repeats a question
+        latest = {}
+        for qa, vec in zip(qa_pairs, vectors):
+            latest[pair_id(qa['question'])] = (qa, vec)
+        if not latest:
+            return 0, 0
+
+        ids = np.fromiter(latest.keys(), dtype=np.int64, count=len(latest))
+        existing = ids[np.isin(ids, self.ids())]
+        if len(existing):
+            self.index.remove_ids(existing)
+
+        vectors = np.stack([vec for _, vec in latest.values()]).astype('float32')
+        self.index.add_with_ids(vectors, ids)
+        for doc_id, (qa, _) in latest.items():
+            self.metadata[doc_id] = qa
+        return len(ids) - len(existing), len(existing)
+
+    def add_pairs(self, qa_pairs):
+        """Embed and add (or replace) Q&A pairs"""
+        return self.add_vectors(qa_pairs, self._encode(qa_pairs))
+
+    def delete(self, questions):
+        """
+        Retire pairs by question text (tombstone; vectors stay until compact())
+
+        Returns:
+            Number of pairs retired
+        """
+        retired = 0
+        for question in questions:
+            if self.metadata.pop(pair_id(question), None) is not None:
+                retired += 1
+        return retired
+
+    def ids(self):
+        """All ids currently stored in the index (including tombstones)"""
+        return faiss.vector_to_array(self.index.id_map)
+
+    def tombstones(self):
+        ids = self.ids()
+        return ids[~np.isin(ids, np.fromiter(self.metadata.keys(), dtype=np.int64))]
+
+    def compact(self):
+        """Physically remove tombstoned vectors; returns how many were removed"""
+        dead = self.tombstones()
+        if len(dead):
+            self.index.remove_ids(dead)
+        return len(dead)
+
+    def save(self):
+        """Write index and metadata (each via a temp file, then renamed)"""
+        tmp_index = self.index_file.with_suffix('.tmp')
+        faiss.write_index(self.index, str(tmp_index))
+        tmp_meta = self.metadata_file.with_suffix('.tmp')
+        with open(tmp_meta, "wb") as f:
+            pickle.dump(self.metadata, f)
+        os.replace(tmp_index, self.index_file)
+        os.replace(tmp_meta, self.metadata_file)
+        if INDEX_MODE == 'binary':
+            # Keep the Hamming + re-rank files in step with the float index
+            from services.faiss_store import create_binary_index
+            create_binary_index(self.index_file)
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Kisan Call Centre - Incremental Index Update")
+    print("=" * 60)
+
+    # Usage:
+    #   python index_updater.py add FILE        add/replace pairs from a .json/.parquet file
+    #   python index_updater.py delete FILE     retire pairs (JSON list of questions or pairs)
+    #   python index_updater.py compact         drop retired vectors from the index
+    if len(sys.argv) < 2 or sys.argv[1] not in ('add', 'delete', 'compact'):
+        print("Usage: python index_updater.py add FILE | delete FILE | compact")
+        sys.exit(1)
+
+    store = IncrementalIndex().load()
+    command = sys.argv[1]
+
+    if command == 'add':
+        new_pairs = load_qa_pairs(sys.argv[2])
+        added, replaced = store.add_pairs(new_pairs)
+        print(f"[SUCCESS] Added {added}, replaced {replaced} Q&A pairs")
+    elif command == 'delete':
+        with open(sys.argv[2], "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        questions = [e['question'] if isinstance(e, dict) else e for e in entries]
+        print(f"[SUCCESS] Retired {store.delete(questions)} Q&A pairs")
+    else:
+        print(f"[SUCCESS] Removed {store.compact()} retired vectors")
+
+    store.save()
+    print(f"  Index vectors: {store.index.ntotal} | Live pairs: {len(store.metadata)} | "
+          f"Tombstones: {len(store.tombstones())}")
@@ -0,0 +1,310 @@
+"""
+Knowledge-Base Bundle Module
+Packs the FAISS index, embedding vectors and Q&A metadata into one
+memory-mappable file so deployments cannot ship mismatched pieces
+
+Layout (all integers little-endian):
+
+    [0:16]   magic b'KCCKB\\0\\0\\0', format version (uint32), header length (uint32)
+    [16:..]  JSON header: dimension, count, index kind, and per section its
+             offset, length and CRC-32
+    ...      sections, each aligned to PAGE_SIZE:
+               index        serialized FAISS index (float) or IndexBinaryFlat;
+                            flat float indexes are stored empty and refilled
+                            from vectors on open, so the file holds one copy
+               vectors      float32 (count, dimension), row order = metadata order
+               ids          int64 stable ids, ascending (id-mapped indexes only)
+               meta_offsets uint64 (count + 1) byte offsets into meta
+               meta         UTF-8 JSON records, one per pair, back to back
+
+Opening maps the file and builds only the index; vectors and metadata
+records are read from the page cache on demand.
+"""
+
+import json
+import mmap
+import pickle
+import struct
+import sys
+import time
+import zlib
+from collections.abc import Mapping
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import faiss
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+from config import FAISS_INDEX_FILE, METADATA_FILE, KB_BUNDLE_FILE, BINARY_CANDIDATES
+from services.faiss_store import binarize, reconstruct_vectors, BinaryRerankIndex
+
+MAGIC = b'KCCKB\0\0\0'
+FORMAT_VERSION = 2
+PAGE_SIZE = 4096
+_PREAMBLE = struct.Struct('<8sII')
+
+
+class BundleError(ValueError):
+    """Raised for unreadable, corrupt or internally inconsistent bundles"""
+
+
+def _crc32(buffer):
+    return zlib.crc32(buffer) & 0xFFFFFFFF
+
+
+def _live_corpus(index, metadata):
+    """
+    (index, vectors, ids, records) with tombstones dropped
+
+    ids is None for positional indexes. For id-mapped ones, rows are sorted
+    by id so the bundle can look metadata up with a binary search.
+    """
+    vectors, ids = reconstruct_vectors(index)
+    if ids is None:
+        return index, vectors, None, list(metadata)
+
+    live = np.isin(ids, np.fromiter(metadata.keys(), dtype=np.int64, count=len(metadata)))
+    if not live.all():
+        index = faiss.clone_index(index)
+        index.remove_ids(ids[~live])
+        vectors, ids = vectors[live], ids[live]
+    order = np.argsort(ids)
+    ids = ids[order]
+    return index, vectors[order], ids, [metadata[int(i)] for i in ids]
+
+
+def _flat_shell(index):
+    """Empty copy of a flat (optionally id-mapped) index, or None for other kinds"""
+    inner = faiss.downcast_index(index)
+    if isinstance(inner, faiss.IndexIDMap2):
+        inner = faiss.downcast_index(inner.index)
+    if not isinstance(inner, faiss.IndexFlat):
+        return None
+    shell = faiss.clone_index(index)
+    shell.reset()
+    return shell
+
+
+def write_bundle(
+    bundle_file=KB_BUNDLE_FILE,
+    index_file=FAISS_INDEX_FILE,
+    metadata_file=METADATA_FILE,
+    binary=False,
+):
+    """
+    Write a bundle from the loose index and metadata files
+
+    Args:
+        binary: Store an IndexBinaryFlat over the vectors' sign bits instead
+                of the float index; searches then re-rank against the
+                memory-mapped vector block (see BinaryRerankIndex)
+
+    Returns:
+        True on success
+    """
+    with open(metadata_file, "rb") as f:
+        metadata = pickle.load(f)
+    index, vectors, ids, records = _live_corpus(faiss.read_index(str(index_file)), metadata)
+    vectors = np.ascontiguousarray(vectors, dtype='float32')
+    if len(records) != len(vectors):
+        print(f"[ERROR] {index_file} has {len(vectors)} vectors but {metadata_file} has {len(records)} records")
+        return False
+
+    shell = None
+    if binary:
+        binary_index = faiss.IndexBinaryFlat(vectors.shape[1])
+        binary_index.add(binarize(vectors))
+        index_blob = faiss.serialize_index_binary(binary_index)
+    else:
+        # A flat index's codes are the vectors: store it empty rather than twice
+        shell = _flat_shell(index)
+        index_blob = faiss.serialize_index(index if shell is None else shell)
+
+    encoded = [json.dumps(r, ensure_ascii=False, separators=(',', ':')).encode('utf-8') for r in records]
+    offsets = np.zeros(len(encoded) + 1, dtype='<u8')
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+
+    sections = [('index', index_blob.tobytes()), ('vectors', vectors.astype('<f4').tobytes())]
+    if ids is not None:
+        sections.append(('ids', ids.astype('<i8').tobytes()))
+    sections += [('meta_offsets', offsets.tobytes()), ('meta', b''.join(encoded))]
+
+    header = {
+        'format_version': FORMAT_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'dimension': int(vectors.shape[1]),
+        'count': len(records),
+        'index_kind': 'binary' if binary else 'float',
+        'index_from_vectors': shell is not None,
+        'sections': {},
+    }
+    # Offsets depend on the header length, so lay out with a reserved header size
+    header_space = PAGE_SIZE
+    while True:
+        offset = header_space
+        for name, data in sections:
+            header['sections'][name] = {'offset': offset, 'length': len(data), 'crc32': _crc32(data)}
+            offset += -(-len(data) // PAGE_SIZE) * PAGE_SIZE
+        header_bytes = json.dumps(header, sort_keys=True).encode('utf-8')
+        if _PREAMBLE.size + len(header_bytes) <= header_space:
+            break
+        header_space += PAGE_SIZE
+
+    bundle_file = Path(bundle_file)
+    bundle_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp = bundle_file.with_suffix('.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name, data in sections:
+            f.seek(header['sections'][name]['offset'])
+            f.write(data)
+        f.truncate(offset)
+    tmp.replace(bundle_file)
+
+    print(f"[SUCCESS] Bundle saved to: {bundle_file} ({bundle_file.stat().st_size / (1024*1024):.2f} MB, "
+          f"{len(records)} pairs, {header['index_kind']} index)")
+    return True
+
+
+class BundleMetadata(Mapping):
+    """
+    Lazy id -> Q&A pair view over the bundle's meta block
+
+    Keys are row positions for positional indexes and stable ids for
+    id-mapped ones, matching the labels FAISS search returns.
+    """
+
+    def __init__(self, buffer, offsets, ids=None):
+        self._buffer = buffer
+        self._offsets = offsets
+        self._ids = ids
+
+    def _row(self, key):
+        if self._ids is None:
+            return key if 0 <= key < len(self) else None
+        row = int(np.searchsorted(self._ids, key))
+        return row if row < len(self._ids) and self._ids[row] == key else None
+
+    def __getitem__(self, key):
+        row = self._row(int(key))
+        if row is None:
+            raise KeyError(key)
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        return json.loads(bytes(self._buffer[start:end]).decode('utf-8'))
+
+    def __iter__(self):
+        return iter(range(len(self)) if self._ids is None else (int(i) for i in self._ids))
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+
+class KBBundle:
+    """A memory-mapped bundle: .index (searchable), .vectors, .metadata"""
+
+    def __init__(self, bundle_file=KB_BUNDLE_FILE):
+        self.bundle_file = Path(bundle_file)
+        self.header = None
+        self.index = None
+        self.vectors = None
+        self.metadata = None
+        self._file = None
+        self._mmap = None
+
+    def _section(self, name):
+        info = self.header['sections'].get(name)
+        if info is None:
+            return None
+        return memoryview(self._mmap)[info['offset']:info['offset'] + info['length']]
+
+    def open(self, verify=True, candidates=BINARY_CANDIDATES):
+        """
+        Map the bundle and validate it
+
+        Args:
+            verify: Check every section's CRC-32 (reads the whole file once;
+                    structural checks always run)
+            candidates: Hamming candidates re-ranked per query (binary bundles)
+        """
+        if not self.bundle_file.exists():
+            raise FileNotFoundError(f"Bundle not found: {self.bundle_file}")
+        self._file = open(self.bundle_file, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, header_len = _PREAMBLE.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise BundleError(f"Not a knowledge-base bundle: {self.bundle_file}")
+        if version > FORMAT_VERSION:
+            raise BundleError(f"Bundle format v{version} is newer than supported v{FORMAT_VERSION}")
+        self.header = json.loads(bytes(self._mmap[_PREAMBLE.size:_PREAMBLE.size + header_len]))
+
+        for name, info in self.header['sections'].items():
+            if info['offset'] + info['length'] > len(self._mmap):
+                raise BundleError(f"Bundle truncated: section '{name}' extends past end of file")
+            if verify and _crc32(self._section(name)) != info['crc32']:
+                raise BundleError(f"Checksum mismatch in bundle section '{name}'")
+
+        count, dimension = self.header['count'], self.header['dimension']
+        self.vectors = np.frombuffer(self._section('vectors'), dtype='<f4').reshape(count, dimension)
+        offsets = np.frombuffer(self._section('meta_offsets'), dtype='<u8')
+        ids_section = self._section('ids')
+        ids = np.frombuffer(ids_section, dtype='<i8') if ids_section is not None else None
+        self.metadata = BundleMetadata(self._section('meta'), offsets, ids)
+
+        blob = np.frombuffer(self._section('index'), dtype='uint8')
+        if self.header['index_kind'] == 'binary':
+            self.index = BinaryRerankIndex(faiss.deserialize_index_binary(blob), self.vectors, ids, candidates)
+        else:
+            self.index = faiss.deserialize_index(blob)
+            if self.header.get('index_from_vectors'):
+                # Rows are in metadata order (ascending ids when id-mapped)
+                if ids is None:
+                    self.index.add(self.vectors)
+                else:
+                    self.index.add_with_ids(self.vectors, ids)
+
+        if len(offsets) != count + 1 or (ids is not None and len(ids) != count) or self.index.ntotal != count:
+            raise BundleError(
+                f"Bundle pieces disagree: index has {self.index.ntotal} vectors, "
+                f"header {count}, metadata {len(offsets) - 1}"
+            )
+        return self
+
+    def close(self):
+        # Views handed out (vectors, metadata) must be dropped before the map can close
+        self.index = self.vectors = self.metadata = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+            self._mmap = self._file = None
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Kisan Call Centre - Knowledge-Base Bundle")
+    print("=" * 60)
+
+    # Usage:
+    #   python kb_bundle.py build [OUT] [--binary]   pack faiss_index.bin + meta.pkl
+    #   python kb_bundle.py verify [BUNDLE]          check checksums and report open time
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    if not args or args[0] not in ('build', 'verify'):
+        print("Usage: python kb_bundle.py build [OUT] [--binary] | verify [BUNDLE]")
+        sys.exit(1)
+    path = args[1] if len(args) > 1 else KB_BUNDLE_FILE
+
+    if args[0] == 'build':
+        sys.exit(0 if write_bundle(path, binary='--binary' in sys.argv) else 1)
+
+    for verify in (False, True):
+        start = time.perf_counter()
+        bundle = KBBundle(path).open(verify=verify)
+        ms = (time.perf_counter() - start) * 1000
+        print(f"[INFO] Opened in {ms:.1f} ms ({'with' if verify else 'without'} checksum verification)")
+    header = bundle.header
+    print(f"[SUCCESS] {header['count']} pairs x {header['dimension']}d, {header['index_kind']} index, "
+          f"format v{header['format_version']}, built {header['created']}")
+    bundle.close()
@@ -0,0 +1,243 @@
+"""
+LLM Backends Module
+What WatsonxService calls to generate text: Google Gemini, or a local
+fake with configurable latency, errors and streaming for load tests
+"""
+
+import asyncio
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+from config import (
+    LLM_TOP_P, LLM_POOL_SIZE, LLM_FAKE_LATENCY_MEDIAN, LLM_FAKE_LATENCY_P95, LLM_FAKE_ERROR_RATE,
+    LLM_FAKE_CHUNK_CHARS, LLM_FAKE_SEED, LLM_FAKE_ANSWERS_FILE
+)
+from services.context_builder import estimate_tokens
+
+
+class LLMBackend(ABC):
+    """
+    Interface of a text generation backend
+
+    Responses (and stream chunks) have .text and .usage_metadata
+    (prompt_token_count, candidates_token_count; may be None).
+    """
+
+    name = 'base'
+
+    @abstractmethod
+    def generate(self, prompt, system_instruction, max_tokens, temperature, timeout=None):
+        """Whole response for a prompt, within timeout seconds"""
+
+    @abstractmethod
+    async def generate_async(self, prompt, system_instruction, max_tokens, temperature, timeout=None):
+        """generate() on the event loop"""
+
+    @abstractmethod
+    def generate_stream(self, prompt, system_instruction, max_tokens, temperature, timeout=None):
+        """Iterator of response chunks"""
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini through google-genai, on keep-alive connection pools"""
+
+    name = 'gemini'
+
+    def __init__(self, api_key, model_name):
+        import httpx
+        from google import genai
+        from google.genai import types
+
+        self.model_name = model_name
+        # Sync calls and the shared async loop each reuse their pool across requests
+        limits = httpx.Limits(max_connections=LLM_POOL_SIZE, max_keepalive_connections=LLM_POOL_SIZE)
+        self.client = genai.Client(
+            api_key=api_key,
+            http_options=types.HttpOptions(
+                httpx_client=httpx.Client(limits=limits),
+                httpx_async_client=httpx.AsyncClient(limits=limits),
+            ),
+        )
+
+    def _config(self, system_instruction, max_tokens, temperature, timeout):
+        from google.genai import types
+
+        return types.GenerateContentConfig(
+            system_instruction=system_instruction,
+            max_output_tokens=max_tokens,
+            temperature=temperature,
+            top_p=LLM_TOP_P,
+            # Per-attempt HTTP timeout, in milliseconds
+            http_options=types.HttpOptions(timeout=max(1, int(timeout * 1000))) if timeout else None,
+        )
+
+    def generate(self, prompt, system_instruction, max_tokens, temperature, timeout=None):
+        return self.client.models.generate_content(
+            model=self.model_name,
+            contents=prompt,
+            config=self._config(system_instruction, max_tokens, temperature, timeout),
+        )
+
+    async def generate_async(self, prompt, system_instruction, max_tokens, temperature, timeout=None):
+        return await self.client.aio.models.generate_content(
+            model=self.model_name,
+            contents=prompt,
+            config=self._config(system_instruction, max_tokens, temperature, timeout),
+        )
+
+    def generate_stream(self, prompt, system_instruction, max_tokens, temperature, timeout=None):
+        return self.client.models.generate_content_stream(
+            model=self.model_name,
+            contents=prompt,
+            config=self._config(system_instruction, max_tokens, temperature, timeout),
+        )
+
+
+class FakeUpstreamError(RuntimeError):
+    """Injected failure, shaped like an HTTP API error (code = status)"""
+
+    def __init__(self, code=503):
+        super().__init__(f"{code} fake upstream error")
+        self.code = code
+
+
+# Share of a fake response's latency spent before the first stream chunk
+_FIRST_CHUNK_SHARE = 0.3
+
+_QUESTION_RES = (
+    re.compile(r"Farmer's Question: (.+)"),
+    re.compile(r"A farmer asked: '(.+?)'"),
+)
+_CONTEXT_ANSWER_RE = re.compile(r'^\s*A: (.+)$', re.MULTILINE)
+
+
+class FakeBackend(LLMBackend):
+    """
+    Deterministic local stand-in for load tests (no network, no quota)
+
+    Answers are canned (LLM_FAKE_ANSWERS_FILE, a JSON list of strings,
+    picked by a hash of the question) or built from a template that
+    echoes the question and the top retrieved answer, so the same prompt
+    always gets the same text. Latency is log-normal with the configured
+    median and p95, a share of calls fail with a retryable 503 (or time
+    out when the sampled latency exceeds the timeout), and streams are
+    cut into fixed-size chunks spread over the latency. Latencies and
+    failures come from one seeded generator, so a sequential run is
+    reproducible.
+    """
+
+    name = 'fake'
+
+    def __init__(self, latency_median=LLM_FAKE_LATENCY_MEDIAN, latency_p95=LLM_FAKE_LATENCY_P95,
+                 error_rate=LLM_FAKE_ERROR_RATE, chunk_chars=LLM_FAKE_CHUNK_CHARS, seed=LLM_FAKE_SEED,
+                 answers_file=LLM_FAKE_ANSWERS_FILE):
+        """
+        Args:
+            latency_median: Median seconds per response
+            latency_p95: 95th percentile seconds per response
+            error_rate: Fraction of calls that fail
+            chunk_chars: Characters per stream chunk
+            seed: Seed for latencies and failures
+            answers_file: Optional JSON list of canned answers
+        """
+        self.latency_median = latency_median
+        # Log-normal spread that puts the 95th percentile at latency_p95
+        self.sigma = 0.0
+        if 0 < latency_median < latency_p95:
+            self.sigma = math.log(latency_p95 / latency_median) / 1.645
+        self.error_rate = error_rate
+        self.chunk_chars = max(1, chunk_chars)
+        self.canned = json.loads(Path(answers_file).read_text(encoding='utf-8')) if answers_file else None
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _sample(self):
+        """(latency seconds, failure to raise or None) for one call"""
+        with self._lock:
+            latency = self.latency_median * math.exp(self._random.gauss(0, self.sigma))
+            failed = self._random.random() < self.error_rate
+        return latency, FakeUpstreamError() if failed else None
+
+    def _answer(self, prompt, max_tokens):
+        question = prompt[:200]
+        for pattern in _QUESTION_RES:
+            match = pattern.search(prompt)
+            if match:
+                question = match.group(1).strip()
+                break
+        if self.canned:
+            text = self.canned[zlib.crc32(question.encode('utf-8')) % len(self.canned)]
+        else:
+            context = _CONTEXT_ANSWER_RE.search(prompt)
+            text = (f"Advice for: {question}\n\n"
+                    f"- {context.group(1).strip() if context else 'Consult your local Krishi Vigyan Kendra.'}\n"
+                    f"- Follow the recommended dose and repeat after 10-15 days if needed.\n"
+                    f"- (Generated by the fake LLM backend for testing.)")
+        # Respect max_tokens roughly, as the real model would
+        return text[:max_tokens * 4] if max_tokens else text
+
+    def _response(self, prompt, text):
+        usage = SimpleNamespace(prompt_token_count=estimate_tokens(prompt), candidates_token_count=estimate_tokens(text))
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+    def _outcome(self, timeout):
+        """(seconds to wait, error to raise after waiting or None)"""
+        latency, error = self._sample()
+        if timeout is not None and latency > timeout:
+            return timeout, TimeoutError(f"fake LLM call timed out after {timeout:.1f}s")
+        return latency, error
+
+    def generate(self, prompt, system_instruction, max_tokens, temperature, timeout=None):
+        wait, error = self._outcome(timeout)
+        time.sleep(wait)
+        if error is not None:
+            raise error
+        return self._response(prompt, self._answer(prompt, max_tokens))
+
+    async def generate_async(self, prompt, system_instruction, max_tokens, temperature, timeout=None):
+        wait, error = self._outcome(timeout)
+        await asyncio.sleep(wait)
+        if error is not None:
+            raise error
+        return self._response(prompt, self._answer(prompt, max_tokens))
+
+    def generate_stream(self, prompt, system_instruction, max_tokens, temperature, timeout=None):
+        latency, error = self._sample()
+        text = self._answer(prompt, max_tokens)
+        chunks = [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)]
+        first_wait = latency * _FIRST_CHUNK_SHARE
+        if timeout is not None and first_wait > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"fake LLM stream timed out after {timeout:.1f}s")
+        time.sleep(first_wait)
+        if error is not None:
+            raise error
+        gap = (latency - first_wait) / max(1, len(chunks) - 1)
+        for i, chunk in enumerate(chunks):
+            if i:
+                time.sleep(gap)
+            usage = None
+            if i == len(chunks) - 1:
+                usage = SimpleNamespace(prompt_token_count=estimate_tokens(prompt),
+                                        candidates_token_count=estimate_tokens(text))
+            yield SimpleNamespace(text=chunk, usage_metadata=usage)
+
+
+def create_backend(name, api_key=None, model_name=None):
+    """Backend by config name: 'gemini' or 'fake'"""
+    if name == 'fake':
+        return FakeBackend()
+    if name == 'gemini':
+        return GeminiBackend(api_key, model_name)
+    raise ValueError(f"Unknown LLM backend: {name!r} (expected 'gemini' or 'fake')")
@@ -0,0 +1,184 @@
+"""
+LLM Limiter Module
+Caps concurrent LLM calls and their rate (token bucket), with a bounded
+queue wait, so traffic spikes degrade to offline answers instead of
+flooding Gemini into quota errors
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+from config import LLM_MAX_CONCURRENT, LLM_REQUESTS_PER_MINUTE, LLM_RATE_BURST, LLM_QUEUE_TIMEOUT
+
+# How often async waiters re-check for a slot (releases come from any thread)
+_POLL_INTERVAL = 0.02
+
+
+class LLMUnavailableError(RuntimeError):
+    """The LLM was not called to protect it; serve the offline answer instead"""
+
+
+class LLMBusyError(LLMUnavailableError):
+    """No LLM slot became free within the queue wait"""
+
+
+class LLMLimiter:
+    """
+    Concurrency cap plus requests/minute token bucket, shared by threads
+    and the async loop
+
+    Limits are per process: with several gunicorn workers, divide the
+    upstream quota between them.
+
+    A speculative call (QueryHandler's no-context fallback) takes a slot
+    and a rate token like any other, and keeps the token even when it is
+    cancelled, since by then the request has usually been sent. Callers
+    therefore start one only when has_capacity() shows room for it and the
+    call it backs up, so speculation never makes the primary call queue.
+    """
+
+    def __init__(self, max_concurrent=LLM_MAX_CONCURRENT, requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+                 burst=LLM_RATE_BURST, max_wait=LLM_QUEUE_TIMEOUT):
+        """
+        Args:
+            max_concurrent: Calls allowed in flight at once
+            requests_per_minute: Sustained call rate (0 disables the rate limit)
+            burst: Calls allowed back to back before the rate applies
+            max_wait: Longest a caller queues for a slot
+        """
+        self.max_concurrent = max_concurrent
+        self.rate = requests_per_minute / 60.0
+        self.burst = max(1, burst)
+        self.max_wait = max_wait
+        self._tokens = float(self.burst)
+        self._refilled = time.monotonic()
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self.queued = 0
+        self.max_queued = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def _refill(self, now):
+        if self.rate:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+
+    def _try_take(self):
+        """Take a slot if possible; otherwise seconds until a token is due (None: wait for a release)"""
+        now = time.monotonic()
+        self._refill(now)
+        if self._in_flight >= self.max_concurrent:
+            return False, None
+        if self.rate and self._tokens < 1:
+            return False, (1 - self._tokens) / self.rate
+        if self.rate:
+            self._tokens -= 1
+        self._in_flight += 1
+        self.admitted += 1
+        return True, None
+
+    def _enqueue(self):
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+
+    def _reject(self, waited):
+        self.rejected += 1
+        raise LLMBusyError(f"LLM busy: no slot after {waited:.1f}s "
+                           f"({self._in_flight} in flight, {self.queued} queued)")
+
+    def acquire(self, timeout=None):
+        """
+        Block until a slot is free, for at most min(timeout, max_wait) seconds
+
+        Returns:
+            Seconds spent waiting
+
+        Raises:
+            LLMBusyError: No slot in time
+        """
+        wait = self.max_wait if timeout is None else min(timeout, self.max_wait)
+        start = time.monotonic()
+        with self._cond:
+            taken, retry_in = self._try_take()
+            if taken:
+                return 0.0
+            self._enqueue()
+            try:
+                while True:
+                    remaining = start + wait - time.monotonic()
+                    if remaining <= 0:
+                        self._reject(time.monotonic() - start)
+                    self._cond.wait(remaining if retry_in is None else min(retry_in, remaining))
+                    taken, retry_in = self._try_take()
+                    if taken:
+                        return time.monotonic() - start
+            finally:
+                self.queued -= 1
+
+    async def acquire_async(self, timeout=None):
+        """acquire() without blocking the event loop"""
+        wait = self.max_wait if timeout is None else min(timeout, self.max_wait)
+        start = time.monotonic()
+        with self._cond:
+            taken, retry_in = self._try_take()
+            if taken:
+                return 0.0
+            self._enqueue()
+        try:
+            while True:
+                remaining = start + wait - time.monotonic()
+                if remaining <= 0:
+                    with self._cond:
+                        self._reject(time.monotonic() - start)
+                await asyncio.sleep(min(retry_in or _POLL_INTERVAL, remaining))
+                with self._cond:
+                    taken, retry_in = self._try_take()
+                if taken:
+                    return time.monotonic() - start
+        finally:
+            with self._cond:
+                self.queued -= 1
+
+    def has_capacity(self, calls=1):
+        """
+        True if `calls` more calls could be admitted now without queueing
+
+        A non-blocking peek, not a reservation: another caller may take
+        the room before this one acquires.
+        """
+        with self._cond:
+            self._refill(time.monotonic())
+            if self._in_flight + calls > self.max_concurrent:
+                return False
+            return not self.rate or self._tokens >= calls
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            self._refill(time.monotonic())
+            return {'in_flight': self._in_flight, 'queue_depth': self.queued, 'max_queue_depth': self.max_queued,
+                    'admitted': self.admitted, 'rejected': self.rejected,
+                    'tokens': round(self._tokens, 2) if self.rate else None}
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_limiter():
+    """The process-wide limiter every WatsonxService uses by default"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = LLMLimiter()
+    return _shared
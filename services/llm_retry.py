@@ -0,0 +1,220 @@
+"""
+LLM Retry Module
+Deadline-aware retries with exponential backoff and full jitter, plus
+attempt/latency metrics for calls to the LLM
+"""
+
+import asyncio
+import random
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+from config import (
+    LLM_CALL_TIMEOUT, LLM_REQUEST_DEADLINE, LLM_MAX_ATTEMPTS, LLM_RETRY_BASE_DELAY, LLM_RETRY_MAX_DELAY
+)
+
+# HTTP statuses worth another attempt (timeouts, rate limits, server errors)
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+# Don't start an attempt with less time than this left before the deadline
+_MIN_ATTEMPT_TIME = 1.0
+
+# Latency samples kept for percentiles
+_SAMPLES = 500
+
+
+def is_timeout(error):
+    try:
+        import httpx
+        if isinstance(error, httpx.TimeoutException):
+            return True
+    except ImportError:
+        pass
+    return isinstance(error, (TimeoutError, asyncio.TimeoutError))
+
+
+def is_retryable(error):
+    """True for transient failures: timeouts, dropped connections, 408/429/5xx"""
+    if is_timeout(error):
+        return True
+    try:
+        import httpx
+        if isinstance(error, (httpx.NetworkError, httpx.RemoteProtocolError)):
+            return True
+    except ImportError:
+        pass
+    # google-genai's APIError (and the fake backend's errors) carry the HTTP status as .code
+    code = getattr(error, 'code', None)
+    return isinstance(code, int) and code in RETRYABLE_STATUS
+
+
+async def wait_with_timeout(awaitable, timeout):
+    """asyncio.wait_for, but the TimeoutError says what ran out"""
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"LLM call timed out after {timeout:.1f}s") from None
+
+
+def _percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class LLMMetrics:
+    """Thread-safe counters and recent latencies for LLM calls and their attempts"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.failures = 0
+        self.timeouts = 0
+        self._attempt_latency = deque(maxlen=_SAMPLES)
+        self._call_latency = deque(maxlen=_SAMPLES)
+
+    def record_attempt(self, seconds, error=None):
+        with self._lock:
+            self.attempts += 1
+            self._attempt_latency.append(seconds)
+            if error is not None and is_timeout(error):
+                self.timeouts += 1
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_call(self, seconds, ok):
+        with self._lock:
+            self.calls += 1
+            self._call_latency.append(seconds)
+            if not ok:
+                self.failures += 1
+
+    def stats(self):
+        with self._lock:
+            attempt_latency = list(self._attempt_latency)
+            call_latency = list(self._call_latency)
+            stats = {'calls': self.calls, 'attempts': self.attempts, 'retries': self.retries,
+                     'failures': self.failures, 'timeouts': self.timeouts}
+        for name, samples in (('attempt', attempt_latency), ('call', call_latency)):
+            for q in (0.5, 0.95):
+                value = _percentile(samples, q)
+                stats[f'{name}_p{round(q * 100)}_ms'] = None if value is None else round(value * 1000, 1)
+        return stats
+
+
+class RetryPolicy:
+    """
+    Runs a call with per-attempt timeouts inside an overall deadline
+
+    Each attempt gets min(call_timeout, time left). Transient failures are
+    retried after a random delay in [0, base_delay * 2**n] (capped at
+    max_delay), but only if the delay plus a minimal attempt still fits
+    before the deadline; otherwise the last error is raised.
+    """
+
+    def __init__(self, metrics=None, max_attempts=LLM_MAX_ATTEMPTS, call_timeout=LLM_CALL_TIMEOUT,
+                 deadline=LLM_REQUEST_DEADLINE, base_delay=LLM_RETRY_BASE_DELAY, max_delay=LLM_RETRY_MAX_DELAY):
+        """
+        Args:
+            metrics: LLMMetrics to record into (optional)
+            max_attempts: Attempts per call, including the first
+            call_timeout: Seconds per attempt
+            deadline: Default seconds for all attempts when the caller gives no deadline
+            base_delay: Backoff before the first retry (upper bound, jittered)
+            max_delay: Largest backoff
+        """
+        self.metrics = metrics or LLMMetrics()
+        self.max_attempts = max_attempts
+        self.call_timeout = call_timeout
+        self.deadline = deadline
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def _deadline(self, deadline):
+        return time.monotonic() + self.deadline if deadline is None else deadline
+
+    def _attempt_timeout(self, deadline):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("LLM request deadline exceeded")
+        return min(self.call_timeout, remaining)
+
+    def _backoff(self, attempt, error, deadline):
+        """Seconds to wait before the next attempt, or None to give up"""
+        if attempt >= self.max_attempts or not is_retryable(error):
+            return None
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        if time.monotonic() + delay + _MIN_ATTEMPT_TIME > deadline:
+            return None
+        self.metrics.record_retry()
+        return delay
+
+    def run(self, fn, deadline=None):
+        """
+        Call fn(timeout) until it succeeds or retrying is pointless
+
+        Args:
+            fn: Callable taking the attempt's timeout in seconds
+            deadline: time.monotonic() by which the call must be done
+                      (default: now + the policy's deadline)
+        """
+        deadline = self._deadline(deadline)
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            attempt_start = time.monotonic()
+            try:
+                result = fn(self._attempt_timeout(deadline))
+            except Exception as e:
+                self.metrics.record_attempt(time.monotonic() - attempt_start, e)
+                delay = self._backoff(attempt, e, deadline)
+                if delay is None:
+                    self.metrics.record_call(time.monotonic() - start, ok=False)
+                    raise
+                time.sleep(delay)
+                continue
+            self.metrics.record_attempt(time.monotonic() - attempt_start)
+            self.metrics.record_call(time.monotonic() - start, ok=True)
+            return result
+
+    async def run_async(self, make_coro, deadline=None, self_timed=False):
+        """
+        Async run: make_coro(timeout) is awaited, and cancelled if it overruns timeout
+
+        Args:
+            self_timed: make_coro enforces the timeout itself (with
+                        wait_with_timeout), so it sees its own timeouts
+                        rather than being cancelled from here
+        """
+        deadline = self._deadline(deadline)
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            attempt_start = time.monotonic()
+            try:
+                timeout = self._attempt_timeout(deadline)
+                coro = make_coro(timeout)
+                result = await (coro if self_timed else wait_with_timeout(coro, timeout))
+            except Exception as e:
+                self.metrics.record_attempt(time.monotonic() - attempt_start, e)
+                delay = self._backoff(attempt, e, deadline)
+                if delay is None:
+                    self.metrics.record_call(time.monotonic() - start, ok=False)
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self.metrics.record_attempt(time.monotonic() - attempt_start)
+            self.metrics.record_call(time.monotonic() - start, ok=True)
+            return result
@@ -0,0 +1,138 @@
+"""
+Near-Duplicate Detection Module
+Streaming MinHash + LSH filter for near-identical KCC questions
+"""
+
+import re
+import sys
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+from config import NEAR_DUP_SHINGLE_SIZE, NEAR_DUP_THRESHOLD, NEAR_DUP_NUM_PERM
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_NON_WORD_RE = re.compile(r'[^\w\s]+')
+
+# Call-centre boilerplate that carries no topic ("ASKED ABOUT THE CONTROL OF ...")
+STOPWORDS = frozenset({
+    'a', 'about', 'an', 'and', 'asked', 'by', 'control', 'crop', 'crops', 'do',
+    'for', 'farmer', 'how', 'i', 'in', 'info', 'information', 'is', 'me', 'my',
+    'of', 'on', 'please', 'query', 'regarding', 'tell', 'the', 'to', 'what', 'which',
+})
+
+
+def _choose_bands(num_perm, threshold):
+    """Pick (bands, rows) with bands * rows == num_perm whose LSH threshold is closest"""
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        # Similarity at which a pair becomes a candidate with ~50% probability
+        lsh_threshold = (1.0 / bands) ** (1.0 / rows)
+        # Prefer slightly lower thresholds: missed candidates cannot be recovered,
+        # extra candidates are rejected by the signature check
+        score = abs(lsh_threshold - threshold) + (0.05 if lsh_threshold > threshold else 0.0)
+        if best is None or score < best[0]:
+            best = (score, bands, rows)
+    return best[1], best[2]
+
+
+class NearDuplicateFilter:
+    """
+    Streaming near-duplicate detector
+
+    Each text is reduced to character shingles of its topic words (KCC
+    boilerplate such as "asked about the control of" is dropped first),
+    summarised by a MinHash signature and bucketed by LSH bands. A text is a near duplicate when a
+    previously added text shares a band and their estimated Jaccard
+    similarity is at least the threshold. Memory is num_perm * 4 bytes per
+    kept text plus the band buckets.
+    """
+
+    def __init__(self, shingle_size=NEAR_DUP_SHINGLE_SIZE, threshold=NEAR_DUP_THRESHOLD,
+                 num_perm=NEAR_DUP_NUM_PERM, seed=1):
+        """
+        Initialize filter
+
+        Args:
+            shingle_size: Characters per shingle
+            threshold: Minimum estimated Jaccard similarity to count as duplicate
+            num_perm: Number of MinHash permutations (signature length)
+            seed: Seed for the permutation parameters
+        """
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands, self.rows = _choose_bands(num_perm, threshold)
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, (1 << 61) - 1, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, (1 << 61) - 1, size=num_perm, dtype=np.uint64)
+
+        self._buckets = [{} for _ in range(self.bands)]
+        self._signatures = []
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def _shingles(self, text):
+        """Normalized character shingles of a text"""
+        words = _NON_WORD_RE.sub(' ', text.lower()).split()
+        topic = [w for w in words if w not in STOPWORDS] or words
+        # Crude plural folding so "aphids" and "aphid" shingle alike
+        text = ' '.join(w[:-1] if len(w) > 3 and w.endswith('s') else w for w in topic)
+        k = self.shingle_size
+        if len(text) <= k:
+            return {text}
+        return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+    def signature(self, text):
+        """MinHash signature of a text as a uint32 array"""
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode('utf-8')) for s in self._shingles(text)),
+            dtype=np.uint64
+        )
+        # (a * x + b) mod p for every permutation and shingle, overflow wraps as in uint64
+        with np.errstate(over='ignore'):
+            permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME
+        return (permuted & _MAX_HASH).min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature):
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def is_duplicate(self, text, add=True):
+        """
+        Check whether text is a near duplicate of an earlier text
+
+        Args:
+            text: Text to check
+            add: Remember the text if it is not a duplicate
+
+        Returns:
+            True if a similar text was added before
+        """
+        signature = self.signature(text)
+        keys = self._band_keys(signature)
+
+        checked = set()
+        for band, key in enumerate(keys):
+            for candidate in self._buckets[band].get(key, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                similarity = np.count_nonzero(self._signatures[candidate] == signature) / self.num_perm
+                if similarity >= self.threshold:
+                    return True
+
+        if add:
+            doc_id = len(self._signatures)
+            self._signatures.append(signature)
+            for band, key in enumerate(keys):
+                self._buckets[band].setdefault(key, []).append(doc_id)
+        return False
@@ -0,0 +1,142 @@
+"""
+Q&A Pair Storage Module
+Reads and writes Q&A pairs as indented JSON or columnar Parquet
+"""
+
+import json
+from pathlib import Path
+
+# Nested metadata keys, stored as flat meta_<key> columns in Parquet
+METADATA_FIELDS = ['state', 'district', 'crop', 'category', 'query_type', 'season']
+
+# Rows per Parquet row group (the unit of chunked reads)
+ROW_GROUP_SIZE = 50_000
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        return pyarrow
+    except ImportError:
+        raise ImportError(
+            "PyArrow library not installed (needed for .parquet Q&A files). "
+            "Run: pip install pyarrow"
+        )
+
+
+def is_parquet(path):
+    return Path(path).suffix.lower() == '.parquet'
+
+
+def _schema(pa):
+    fields = [pa.field('question', pa.string()), pa.field('answer', pa.string())]
+    # Metadata values repeat heavily, so dictionary-encode them
+    fields += [pa.field(f'meta_{key}', pa.dictionary(pa.int32(), pa.string()))
+               for key in METADATA_FIELDS]
+    return pa.schema(fields)
+
+
+def _to_table(pa, qa_pairs, schema):
+    def text(value):
+        # Missing values (None/NaN) become nulls
+        return value if isinstance(value, str) else None
+
+    columns = {
+        'question': [qa['question'] for qa in qa_pairs],
+        'answer': [qa['answer'] for qa in qa_pairs],
+    }
+    for key in METADATA_FIELDS:
+        columns[f'meta_{key}'] = [text(qa.get('metadata', {}).get(key, '')) for qa in qa_pairs]
+    arrays = [pa.array(columns[f.name], type=pa.string()).dictionary_encode()
+              if pa.types.is_dictionary(f.type) else pa.array(columns[f.name], type=f.type)
+              for f in schema]
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def _from_batch(batch):
+    # Decoding dictionary arrays first is ~10x faster than to_pylist on them
+    columns = {
+        name: (column.dictionary_decode() if hasattr(column, 'dictionary_decode') else column).to_pylist()
+        for name, column in zip(batch.schema.names, batch.columns)
+    }
+    meta = [columns[f'meta_{key}'] for key in METADATA_FIELDS]
+    return [
+        {
+            'question': question,
+            'answer': answer,
+            'metadata': {key: (values[i] if values[i] is not None else '')
+                         for key, values in zip(METADATA_FIELDS, meta)},
+        }
+        for i, (question, answer) in enumerate(zip(columns['question'], columns['answer']))
+    ]
+
+
+class ParquetQAWriter:
+    """Incremental Parquet writer; each write() appends row groups"""
+
+    def __init__(self, path, row_group_size=ROW_GROUP_SIZE):
+        pa = _require_pyarrow()
+        self._pa = pa
+        self._schema = _schema(pa)
+        self._row_group_size = row_group_size
+        self._writer = pa.parquet.ParquetWriter(str(path), self._schema, compression='zstd')
+        self.rows = 0
+
+    def write(self, qa_pairs):
+        if qa_pairs:
+            table = _to_table(self._pa, qa_pairs, self._schema)
+            self._writer.write_table(table, row_group_size=self._row_group_size)
+            self.rows += len(qa_pairs)
+
+    def close(self):
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def save_qa_pairs(qa_pairs, path):
+    """Save Q&A pairs, as Parquet if path ends in .parquet, otherwise indented JSON"""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    if is_parquet(path):
+        with ParquetQAWriter(path) as writer:
+            writer.write(qa_pairs)
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(qa_pairs, f, ensure_ascii=False, indent=2)
+
+
+def iter_qa_batches(path, batch_size=ROW_GROUP_SIZE):
+    """
+    Stream Q&A pairs in batches
+
+    Parquet files are read row group by row group, so memory stays bounded
+    by batch_size. JSON files are loaded whole and sliced.
+    """
+    if is_parquet(path):
+        pa = _require_pyarrow()
+        parquet_file = pa.parquet.ParquetFile(str(path))
+        for batch in parquet_file.iter_batches(batch_size=batch_size):
+            yield _from_batch(batch)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            qa_pairs = json.load(f)
+        for i in range(0, len(qa_pairs), batch_size):
+            yield qa_pairs[i:i + batch_size]
+
+
+def load_qa_pairs(path):
+    """Load all Q&A pairs from a JSON or Parquet file"""
+    return [qa for batch in iter_qa_batches(path) for qa in batch]
+
+
+def count_qa_pairs(path):
+    """Number of Q&A pairs (read from Parquet footer without loading rows)"""
+    if is_parquet(path):
+        pa = _require_pyarrow()
+        return pa.parquet.ParquetFile(str(path)).metadata.num_rows
+    return len(load_qa_pairs(path))
@@ -3,29 +3,80 @@ Query Handler Module
 Unified pipeline for processing user queries
 """
 
+import asyncio
 import sys
+import time
 from pathlib import Path
 
 # Add parent directory to path for imports
 sys.path.append(str(Path(__file__).parent.parent))
-from config import TOP_K_RESULTS
+from config import TOP_K_RESULTS, SPECULATIVE_FALLBACK, LLM_REQUEST_DEADLINE
+from services.response_cache import cache_key, coarse_location
 
 
 class QueryHandler:
     """Unified query processing pipeline"""
     
-    def __init__(self, faiss_searcher, watsonx_service=None):
+    def __init__(self, faiss_searcher, watsonx_service=None, response_cache=None, semantic_cache=None,
+                 single_flight=None):
         """
         Initialize query handler
         
         Args:
             faiss_searcher: FAISSSearcher instance
             watsonx_service: WatsonxService instance (optional, for online mode)
+            response_cache: ResponseCache for online answers (optional)
+            semantic_cache: SemanticCache reusing online answers for reworded
+                            queries (optional)
+            single_flight: SingleFlight shared by the process, so identical
+                           concurrent queries run once (optional)
         """
         self.faiss_searcher = faiss_searcher
         self.watsonx_service = watsonx_service
+        self.response_cache = response_cache
+        self.semantic_cache = semantic_cache
+        self.single_flight = single_flight
     
-    def process_query(self, query, top_k=TOP_K_RESULTS, online_mode=True, location_context=None, language='en'):
+    def _request_key(self, query, top_k, online_mode, language, location, season):
+        online = bool(online_mode and self.watsonx_service)
+        key = cache_key(query, language, location, season,
+                        getattr(self.faiss_searcher, 'kb_version', ''), top_k)
+        return key if online else f"offline:{key}"
+    
+    def _cache_lookup(self, query, top_k, online_mode, language, location, season):
+        """
+        (key, cached result) for an online query; key is None when not cacheable
+
+        Only online answers are cached: offline ones are a FAISS search away.
+        """
+        if self.response_cache is None or not (online_mode and self.watsonx_service):
+            return None, None
+        key = self._request_key(query, top_k, online_mode, language, location, season)
+        return key, self.response_cache.get(key)
+    
+    def _cache_store(self, key, result, cacheable):
+        if key is not None and cacheable:
+            self.response_cache.put(key, result)
+        result.setdefault('cache', 'bypass' if key is None else 'miss')
+        return result
+    
+    def _semantic_context(self, language, location, season):
+        # Answers are only reused for the same language, district, season and knowledge base
+        return (language or 'en', coarse_location(location), season or '',
+                getattr(self.faiss_searcher, 'kb_version', ''))
+    
+    def _semantic_lookup(self, query_embedding, language, location, season):
+        if self.semantic_cache is None:
+            return None
+        return self.semantic_cache.get(query_embedding, self._semantic_context(language, location, season))
+    
+    def _semantic_store(self, query_embedding, language, location, season, online_answer):
+        if self.semantic_cache is not None:
+            self.semantic_cache.add(query_embedding, self._semantic_context(language, location, season),
+                                    online_answer)
+    
+    def process_query(self, query, top_k=TOP_K_RESULTS, online_mode=True, location_context=None, language='en',
+                      location=None, season=None):
         """
         Process user query and return both offline and online answers
         
@@ -35,36 +86,241 @@ class QueryHandler:
             online_mode: Whether to generate LLM response
             location_context: Optional string with date/time/location/season info
             language: Target language for response (default: 'en')
+            location: Farmer's location (cache keys, coarsened to district)
+            season: Current season (response cache key)
             
         Returns:
-            Dictionary with offline_answer and online_answer
+            Dictionary with offline_answer, online_answer and cache
+            ('hit', 'semantic', 'coalesced', 'miss' or 'bypass'); degraded
+            is True when the online answer was skipped or failed (LLM busy,
+            circuit open, or an error) and only the offline answer is given
         """
+        key, cached = self._cache_lookup(query, top_k, online_mode, language, location, season)
+        if cached is not None:
+            return dict(cached, cache='hit')
+        
+        compute = lambda: self._answer(query, top_k, online_mode, location_context, language, location, season)
+        if self.single_flight is None:
+            result, cacheable = compute()
+        else:
+            flight_key = self._request_key(query, top_k, online_mode, language, location, season)
+            (result, cacheable), shared = self.single_flight.do(flight_key, compute)
+            if shared:
+                # The leading request already cached it
+                return dict(result, cache='coalesced')
+        return self._cache_store(key, result, cacheable)
+    
+    def _answer(self, query, top_k, online_mode, location_context, language, location, season):
+        # One LLM time budget per query, however many attempts it takes
+        deadline = time.monotonic() + LLM_REQUEST_DEADLINE
+        
         # Search FAISS for similar Q&A pairs
-        results = self.faiss_searcher.search(query, top_k=top_k)
+        query_embedding = self.faiss_searcher.embed(query)
+        results = self.faiss_searcher.search(query, top_k=top_k, query_embedding=query_embedding)
         
         # Format offline answer
         offline_answer = self._format_offline_answer(results)
         
-        # Generate online answer if enabled
+        # Generate online answer if enabled (unless a reworded query was already answered)
         online_answer = None
+        degraded = False
+        semantic_hit = False
         if online_mode and self.watsonx_service:
+            online_answer = self._semantic_lookup(query_embedding, language, location, season)
+            semantic_hit = online_answer is not None
+        if online_mode and self.watsonx_service and not semantic_hit:
             try:
                 # Extract Q&A pairs for context
                 context_qa_pairs = [r['metadata'] for r in results]
                 
                 # Generate LLM response with location context
                 online_answer = self.watsonx_service.answer_query(
-                    query, context_qa_pairs, location_context=location_context, language=language
+                    query, context_qa_pairs, location_context=location_context, language=language,
+                    deadline=deadline
                 )
+                self._semantic_store(query_embedding, language, location, season, online_answer)
             except Exception as e:
-                online_answer = f"Error generating online response: {e}"
+                print(f"[WARN] Answering offline: {e}")
+                degraded = True
         
-        return {
+        result = {
             'query': query,
             'offline_answer': offline_answer,
             'online_answer': online_answer,
             'retrieved_results': results
         }
+        if semantic_hit:
+            result['cache'] = 'semantic'
+        if degraded:
+            result['degraded'] = True
+        return result, online_answer is not None
+    
+    async def process_query_async(self, query, top_k=TOP_K_RESULTS, online_mode=True, location_context=None,
+                                  language='en', location=None, season=None, speculative=SPECULATIVE_FALLBACK):
+        """
+        process_query, with retrieval and the no-context LLM fallback overlapped
+        
+        The fallback answer (used when retrieval finds nothing) is started
+        speculatively alongside the FAISS search and cancelled as soon as
+        results come back, so an empty search costs one LLM round trip
+        instead of the context answer plus a second fallback call.
+        
+        Args:
+            speculative: Start the fallback before retrieval finishes, when the
+                         LLM limiter has room for it (False waits for an
+                         empty result first)
+            
+        Returns:
+            Same dictionary as process_query
+        """
+        key, cached = self._cache_lookup(query, top_k, online_mode, language, location, season)
+        if cached is not None:
+            return dict(cached, cache='hit')
+        
+        compute = lambda: self._answer_async(query, top_k, online_mode, location_context, language, location, season,
+                                              speculative)
+        if self.single_flight is None:
+            result, cacheable = await compute()
+        else:
+            flight_key = self._request_key(query, top_k, online_mode, language, location, season)
+            (result, cacheable), shared = await self.single_flight.do_async(flight_key, compute)
+            if shared:
+                # The leading request already cached it
+                return dict(result, cache='coalesced')
+        return self._cache_store(key, result, cacheable)
+    
+    async def _answer_async(self, query, top_k, online_mode, location_context, language, location, season,
+                            speculative):
+        loop = asyncio.get_running_loop()
+        online = online_mode and self.watsonx_service is not None
+        deadline = time.monotonic() + LLM_REQUEST_DEADLINE
+        
+        fallback = None
+        # Speculate only with room for both calls, so the fallback cannot make the main call queue
+        if online and speculative and self.watsonx_service.limiter.has_capacity(2):
+            fallback = asyncio.ensure_future(
+                self.watsonx_service.answer_without_context_async(query, location_context, language, deadline)
+            )
+            # A discarded speculative call may fail; don't log it as unretrieved
+            fallback.add_done_callback(lambda task: task.cancelled() or task.exception())
+        
+        try:
+            query_embedding = await loop.run_in_executor(None, self.faiss_searcher.embed, query)
+            online_answer = self._semantic_lookup(query_embedding, language, location, season) if online else None
+            semantic_hit = online_answer is not None
+            if semantic_hit and fallback is not None:
+                fallback.cancel()
+            results = await loop.run_in_executor(
+                None, lambda: self.faiss_searcher.search(query, top_k=top_k, query_embedding=query_embedding)
+            )
+        except BaseException:
+            if fallback is not None:
+                fallback.cancel()
+            raise
+        
+        degraded = False
+        if online and not semantic_hit:
+            if results:
+                if fallback is not None:
+                    fallback.cancel()
+                try:
+                    context_qa_pairs = [r['metadata'] for r in results]
+                    online_answer = await self.watsonx_service.answer_query_async(
+                        query, context_qa_pairs, location_context=location_context, language=language,
+                        deadline=deadline
+                    )
+                    self._semantic_store(query_embedding, language, location, season, online_answer)
+                except Exception as e:
+                    print(f"[WARN] Answering offline: {e}")
+                    degraded = True
+            else:
+                try:
+                    online_answer = await (fallback or self.watsonx_service.answer_without_context_async(
+                        query, location_context, language, deadline
+                    ))
+                    self._semantic_store(query_embedding, language, location, season, online_answer)
+                except Exception as e:
+                    print(f"[WARN] Answering offline: {e}")
+                    degraded = True
+        
+        result = {
+            'query': query,
+            'offline_answer': self._format_offline_answer(results),
+            'online_answer': online_answer,
+            'retrieved_results': results
+        }
+        if semantic_hit:
+            result['cache'] = 'semantic'
+        if degraded:
+            result['degraded'] = True
+        return result, online_answer is not None
+    
+    def stream_query(self, query, top_k=TOP_K_RESULTS, online_mode=True, location_context=None, language='en',
+                     location=None, season=None):
+        """
+        process_query as a stream of events, for Server-Sent Events
+        
+        The offline answer is yielded as soon as retrieval finishes, then the
+        online answer chunk by chunk as the LLM produces it.
+        
+        Yields:
+            (event, data) tuples:
+              ('offline', {query, offline_answer, retrieved_results})
+              ('token', text chunk)      online answer pieces, in order
+              ('error', message)         online answer failed part-way
+              ('done', {online_answer, cache[, degraded]})
+        """
+        key, cached = self._cache_lookup(query, top_k, online_mode, language, location, season)
+        if cached is not None:
+            yield 'offline', {k: cached[k] for k in ('query', 'offline_answer', 'retrieved_results')}
+            if cached.get('online_answer'):
+                yield 'token', cached['online_answer']
+            yield 'done', {'online_answer': cached.get('online_answer'), 'cache': 'hit'}
+            return
+        
+        deadline = time.monotonic() + LLM_REQUEST_DEADLINE
+        query_embedding = self.faiss_searcher.embed(query)
+        results = self.faiss_searcher.search(query, top_k=top_k, query_embedding=query_embedding)
+        result = {
+            'query': query,
+            'offline_answer': self._format_offline_answer(results),
+            'retrieved_results': results
+        }
+        yield 'offline', result
+        
+        online = online_mode and self.watsonx_service is not None
+        online_answer = self._semantic_lookup(query_embedding, language, location, season) if online else None
+        if online_answer is not None:
+            result['cache'] = 'semantic'
+            yield 'token', online_answer
+        elif online:
+            if results:
+                chunks = self.watsonx_service.answer_query_stream(
+                    query, [r['metadata'] for r in results], location_context=location_context, language=language,
+                    deadline=deadline
+                )
+            else:
+                chunks = self.watsonx_service.answer_without_context_stream(query, location_context, language, deadline)
+            parts = []
+            try:
+                for chunk in chunks:
+                    parts.append(chunk)
+                    yield 'token', chunk
+            except Exception as e:
+                if not parts:
+                    # Nothing was streamed yet: the offline answer already sent stands alone
+                    print(f"[WARN] Answering offline: {e}")
+                    yield 'done', {'online_answer': None, 'cache': 'bypass', 'degraded': True}
+                    return
+                yield 'error', f"Error generating online response: {e}"
+                yield 'done', {'online_answer': ''.join(parts) or None, 'cache': 'bypass' if key is None else 'miss'}
+                return
+            online_answer = ''.join(parts)
+            self._semantic_store(query_embedding, language, location, season, online_answer)
+        
+        result['online_answer'] = online_answer
+        self._cache_store(key, result, online_answer is not None)
+        yield 'done', {'online_answer': online_answer, 'cache': result['cache']}
     
     def _format_offline_answer(self, results):
         """
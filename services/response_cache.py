@@ -0,0 +1,127 @@
+"""
+Response Cache Module
+Disk-backed (SQLite) cache of full query answers, shared by every worker
+process on the host
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import sys
+import time
+import unicodedata
+from contextlib import closing
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+from config import RESPONSE_CACHE_FILE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_MAX_ENTRIES
+
+_SPACE_RE = re.compile(r'\s+')
+
+
+def normalize_query(query):
+    """
+    Case-, punctuation- and whitespace-insensitive form of a query
+
+    Only Unicode punctuation (categories P*) is dropped: Indic vowel signs
+    are combining marks, not word characters, and removing them would
+    merge different Hindi queries into one key.
+    """
+    text = unicodedata.normalize('NFC', query).casefold()
+    text = ''.join(' ' if unicodedata.category(ch).startswith('P') else ch for ch in text)
+    return _SPACE_RE.sub(' ', text).strip()
+
+
+def coarse_location(location):
+    """District-level location: first component of 'City, State', case-folded"""
+    return normalize_query((location or 'India').split(',')[0]) or 'india'
+
+
+def cache_key(query, language='en', location=None, season=None, kb_version='', top_k=None):
+    """Stable key for an answer; any part changing gives a new entry"""
+    parts = [normalize_query(query), language or 'en', coarse_location(location),
+             season or '', kb_version or '', top_k]
+    return hashlib.sha256(json.dumps(parts).encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    TTL + LRU-bounded answer cache in a SQLite file
+
+    WAL mode lets gunicorn workers read concurrently while one writes.
+    Each call opens its own short-lived connection, so the cache is safe
+    to use from any thread.
+    """
+
+    def __init__(self, db_file=RESPONSE_CACHE_FILE, ttl=RESPONSE_CACHE_TTL, max_entries=RESPONSE_CACHE_MAX_ENTRIES):
+        """
+        Args:
+            db_file: SQLite file (created on first use)
+            ttl: Seconds an answer stays valid
+            max_entries: Least recently used answers beyond this are evicted
+        """
+        self.db_file = Path(db_file)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # Per-process counters (the table's hit column is global)
+        self.hits = 0
+        self.misses = 0
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS answers (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used)')
+
+    def _connect(self):
+        # Wait for another worker's write instead of failing with "database is locked"
+        return sqlite3.connect(self.db_file, timeout=5.0)
+
+    def get(self, key):
+        """Cached response dict, or None if missing or expired"""
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                'SELECT response FROM answers WHERE key = ? AND created >= ?', (key, now - self.ttl)
+            ).fetchone()
+            if row is not None:
+                conn.execute('UPDATE answers SET last_used = ?, hits = hits + 1 WHERE key = ?', (now, key))
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, response):
+        """Store a JSON-serializable response, then evict expired and excess entries"""
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO answers (key, response, created, last_used, hits) VALUES (?, ?, ?, ?, 0)',
+                (key, json.dumps(response, ensure_ascii=False), now, now)
+            )
+            conn.execute('DELETE FROM answers WHERE created < ?', (now - self.ttl,))
+            conn.execute('''
+                DELETE FROM answers WHERE key IN (
+                    SELECT key FROM answers ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            ''', (self.max_entries,))
+
+    def clear(self):
+        with closing(self._connect()) as conn, conn:
+            conn.execute('DELETE FROM answers')
+
+    def stats(self):
+        with closing(self._connect()) as conn:
+            entries, total_hits = conn.execute('SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM answers').fetchone()
+        return {'entries': entries, 'total_hits': total_hits,
+                'process_hits': self.hits, 'process_misses': self.misses}
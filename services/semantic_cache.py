@@ -0,0 +1,110 @@
+"""
+Semantic Cache Module
+Reuses online answers for reworded queries ("aphid control mustard" vs
+"how to control aphids in mustard crop") by nearest-neighbour search
+over the embeddings of previously answered queries
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import faiss
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+from config import (
+    EMBEDDING_DIMENSION, SEMANTIC_CACHE_MAX_DISTANCE, SEMANTIC_CACHE_TTL, SEMANTIC_CACHE_CAPACITY
+)
+
+# Neighbours examined per lookup (skips expired entries without a rescan)
+_PROBE = 4
+
+
+class SemanticCache:
+    """
+    In-process query-embedding cache, one small FAISS index per context
+
+    A context is a tuple such as (language, district, season, kb_version);
+    answers are only reused within the same context. Entries expire after
+    ttl seconds and the least recently used are evicted beyond capacity.
+    """
+
+    def __init__(self, max_distance=SEMANTIC_CACHE_MAX_DISTANCE, ttl=SEMANTIC_CACHE_TTL,
+                 capacity=SEMANTIC_CACHE_CAPACITY, dimension=EMBEDDING_DIMENSION):
+        """
+        Args:
+            max_distance: Largest squared L2 distance between query embeddings
+                          that counts as the same question (0.2 ~ cosine 0.9
+                          for normalized embeddings)
+            ttl: Seconds an answer can be reused
+            capacity: Maximum number of cached answers across all contexts
+        """
+        self.max_distance = max_distance
+        self.ttl = ttl
+        self.capacity = capacity
+        self.dimension = dimension
+        self._indexes = {}                # context -> IndexIDMap2
+        self._entries = OrderedDict()     # id -> (context, answer, expires), LRU order
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, entry_id):
+        context, _, _ = self._entries.pop(entry_id)
+        index = self._indexes[context]
+        index.remove_ids(np.array([entry_id], dtype=np.int64))
+        if index.ntotal == 0:
+            del self._indexes[context]
+
+    def get(self, embedding, context):
+        """
+        Cached answer for a query embedding in the same context, or None
+
+        Args:
+            embedding: float32 array of shape (1, dimension) or (dimension,)
+            context: Hashable context tuple
+        """
+        embedding = np.asarray(embedding, dtype='float32').reshape(1, -1)
+        with self._lock:
+            index = self._indexes.get(context)
+            if index is not None:
+                distances, ids = index.search(embedding, min(_PROBE, index.ntotal))
+                now = time.time()
+                for distance, entry_id in zip(distances[0], ids[0]):
+                    if entry_id < 0 or distance > self.max_distance:
+                        break
+                    _, answer, expires = self._entries[entry_id]
+                    if expires < now:
+                        self._remove(entry_id)
+                        continue
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    return answer
+            self.misses += 1
+            return None
+
+    def add(self, embedding, context, answer):
+        """Remember an answer for a query embedding"""
+        embedding = np.asarray(embedding, dtype='float32').reshape(1, -1)
+        with self._lock:
+            index = self._indexes.get(context)
+            if index is None:
+                index = self._indexes[context] = faiss.IndexIDMap2(faiss.IndexFlatL2(self.dimension))
+            entry_id = self._next_id
+            self._next_id += 1
+            index.add_with_ids(embedding, np.array([entry_id], dtype=np.int64))
+            self._entries[entry_id] = (context, answer, time.time() + self.ttl)
+            while len(self._entries) > self.capacity:
+                self._remove(next(iter(self._entries)))
+
+    def stats(self):
+        return {'entries': len(self._entries), 'contexts': len(self._indexes),
+                'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,132 @@
+"""
+Single-Flight Module
+Coalesces identical concurrent computations: the first caller for a key
+runs it, later callers wait for and share its result
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+from config import SINGLE_FLIGHT_TIMEOUT
+
+
+class _Call:
+    """One in-flight computation (thread flavour)"""
+
+    def __init__(self, deadline):
+        self.deadline = deadline
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Per-key request coalescing for threads (do) and asyncio tasks (do_async)
+
+    Waiters give up after the key's timeout and compute the result
+    themselves, and a flight older than its timeout no longer accepts new
+    waiters, so a stuck call cannot pin requests forever.
+    """
+
+    def __init__(self, timeout=SINGLE_FLIGHT_TIMEOUT):
+        """
+        Args:
+            timeout: Seconds a waiter waits on another caller's computation
+        """
+        self.timeout = timeout
+        self._calls = {}          # key -> _Call
+        self._tasks = {}          # key -> (deadline, asyncio.Task)
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.shared = 0
+        self.timeouts = 0
+
+    def do(self, key, fn, timeout=None):
+        """
+        Run fn() once for concurrent callers with the same key
+
+        Returns:
+            (result, shared) where shared is True if another caller computed it
+        """
+        timeout = self.timeout if timeout is None else timeout
+        now = time.monotonic()
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None or call.deadline <= now
+            if leader:
+                call = self._calls[key] = _Call(now + timeout)
+
+        if not leader:
+            if call.done.wait(max(0.0, call.deadline - now)):
+                if call.error is not None:
+                    raise call.error
+                self.shared += 1
+                return call.result, True
+            # The flight is stuck: stop waiting and compute independently
+            self.timeouts += 1
+            return fn(), False
+
+        self.leaders += 1
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            call.done.set()
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+
+    async def do_async(self, key, make_coro, timeout=None):
+        """
+        Await make_coro() once for concurrent tasks with the same key
+
+        The shared task is shielded, so a cancelled caller (e.g. a client
+        timeout) does not cancel the computation other callers wait on.
+
+        Returns:
+            (result, shared) where shared is True if another task computed it
+        """
+        timeout = self.timeout if timeout is None else timeout
+        now = time.monotonic()
+        with self._lock:
+            entry = self._tasks.get(key)
+            leader = entry is None or entry[0] <= now
+            if leader:
+                task = asyncio.ensure_future(make_coro())
+                entry = self._tasks[key] = (now + timeout, task)
+
+                def _forget(done_task, key=key):
+                    with self._lock:
+                        if self._tasks.get(key, (None, None))[1] is done_task:
+                            del self._tasks[key]
+                    # Retrieve the exception so a flight nobody awaits is not logged as unhandled
+                    if not done_task.cancelled():
+                        done_task.exception()
+
+                task.add_done_callback(_forget)
+
+        deadline, task = entry
+        if leader:
+            self.leaders += 1
+            return await asyncio.shield(task), False
+
+        try:
+            result = await asyncio.wait_for(asyncio.shield(task), max(0.0, deadline - now))
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return await make_coro(), False
+        self.shared += 1
+        return result, True
+
+    def stats(self):
+        return {'in_flight': len(self._calls) + len(self._tasks), 'leaders': self.leaders,
+                'shared': self.shared, 'timeouts': self.timeouts}
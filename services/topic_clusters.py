@@ -0,0 +1,169 @@
+"""
+Topic Clustering Module
+Groups the knowledge base into k-means topics offline so the dashboard can
+browse it by category without running the encoder at request time
+"""
+
+import json
+import os
+import pickle
+import re
+import sys
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import faiss
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+from config import FAISS_INDEX_FILE, METADATA_FILE, TOPICS_FILE, TOPIC_CENTROIDS_FILE, NUM_TOPICS
+from services.near_dedup import STOPWORDS
+from services.faiss_store import reconstruct_vectors
+
+# Representative questions stored per topic (closest to the centroid first)
+QUESTIONS_PER_TOPIC = 20
+KEYWORDS_PER_TOPIC = 5
+
+_WORD_RE = re.compile(r'[a-z]{3,}')
+# Filler common in KCC call logs, on top of the near-dup stopwords
+_TOPIC_STOPWORDS = STOPWORDS | {'are', 'can', 'from', 'give', 'its', 'suggest', 'that', 'this', 'with'}
+
+
+def _content_words(question):
+    return [w for w in _WORD_RE.findall(question.lower()) if w not in _TOPIC_STOPWORDS]
+
+
+def _corpus(index_file, metadata_file):
+    """(vectors, metadata list) for live pairs, for plain or id-mapped indexes"""
+    vectors, ids = reconstruct_vectors(faiss.read_index(str(index_file)))
+    with open(metadata_file, "rb") as f:
+        metadata = pickle.load(f)
+
+    if ids is not None:
+        # Tombstoned ids have no metadata and are left out
+        live = np.array([int(i) in metadata for i in ids], dtype=bool)
+        return vectors[live], [metadata[int(i)] for i in ids[live]]
+    return vectors, list(metadata)
+
+
+def _keywords(questions, top_n=KEYWORDS_PER_TOPIC):
+    """Most frequent content words across a topic's questions"""
+    counts = Counter()
+    for question in questions:
+        # Count each word once per question so one long question cannot dominate
+        counts.update(set(_content_words(question)))
+    return [word for word, _ in counts.most_common(top_n)]
+
+
+def build_topics(
+    index_file=FAISS_INDEX_FILE,
+    metadata_file=METADATA_FILE,
+    topics_file=TOPICS_FILE,
+    centroids_file=TOPIC_CENTROIDS_FILE,
+    num_topics=NUM_TOPICS,
+    niter=25,
+    seed=1234,
+):
+    """
+    Cluster the corpus embeddings with FAISS k-means
+
+    Writes topics_file (JSON served by /api/topics: label, keywords, size
+    and representative questions per topic) and centroids_file (.npz with
+    the centroids and each pair's topic label).
+
+    Returns:
+        True on success
+    """
+    if not Path(index_file).exists():
+        print(f"[ERROR] File not found - {index_file}")
+        print("Please run faiss_store.py first")
+        return False
+
+    vectors, metadata = _corpus(index_file, metadata_file)
+    vectors = np.ascontiguousarray(vectors, dtype='float32')
+    num_topics = min(num_topics, len(vectors))
+    print(f"[INFO] Clustering {len(vectors)} vectors into {num_topics} topics...")
+
+    kmeans = faiss.Kmeans(vectors.shape[1], num_topics, niter=niter, seed=seed, verbose=False)
+    kmeans.train(vectors)
+    distances, labels = kmeans.index.search(vectors, 1)
+    distances, labels = distances[:, 0], labels[:, 0]
+
+    topics = []
+    for topic_id in range(num_topics):
+        members = np.flatnonzero(labels == topic_id)
+        if len(members) == 0:
+            continue
+        members = members[np.argsort(distances[members])]
+        questions = []
+        seen = set()
+        for i in members:
+            question = metadata[i]['question'].strip()
+            # Skip rewordings of a question already listed ("pest" vs "pests control")
+            key = frozenset(w.rstrip('s') for w in _content_words(question)) or question.lower()
+            if key not in seen:
+                seen.add(key)
+                questions.append(question)
+            if len(questions) >= QUESTIONS_PER_TOPIC:
+                break
+        keywords = _keywords(metadata[i]['question'] for i in members)
+        topics.append({
+            'id': topic_id,
+            'label': ' / '.join(keywords[:2]).title() if keywords else f"Topic {topic_id + 1}",
+            'keywords': keywords,
+            'size': int(len(members)),
+            'questions': questions,
+        })
+    topics.sort(key=lambda t: -t['size'])
+
+    Path(topics_file).parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(topics_file).with_suffix('.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'num_pairs': len(vectors), 'topics': topics}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, topics_file)
+    np.savez(centroids_file, centroids=kmeans.centroids, labels=labels.astype('int32'))
+
+    print(f"[SUCCESS] Topics saved to: {topics_file}")
+    for topic in topics:
+        print(f"  {topic['size']:>6}  {topic['label']:<30} {', '.join(topic['keywords'])}")
+    return True
+
+
+class TopicCatalog:
+    """Precomputed topics, loaded once and served as plain lookups"""
+
+    def __init__(self, topics_file=TOPICS_FILE):
+        self.topics_file = Path(topics_file)
+        self.topics = []
+        self.by_id = {}
+
+    def load(self):
+        if not self.topics_file.exists():
+            raise FileNotFoundError(f"Topics file not found: {self.topics_file}")
+        with open(self.topics_file, 'r', encoding='utf-8') as f:
+            self.topics = json.load(f)['topics']
+        self.by_id = {topic['id']: topic for topic in self.topics}
+        return self
+
+    def summary(self, questions_per_topic=3):
+        """All topics with their first few representative questions"""
+        return [dict(topic, questions=topic['questions'][:questions_per_topic]) for topic in self.topics]
+
+    def get(self, topic_id):
+        return self.by_id.get(topic_id)
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Kisan Call Centre - Topic Clustering")
+    print("=" * 60)
+
+    # Usage: python topic_clusters.py [NUM_TOPICS]
+    success = build_topics(num_topics=int(sys.argv[1]) if len(sys.argv) > 1 else NUM_TOPICS)
+
+    if success:
+        print("\n[SUCCESS] Topic clustering completed successfully!")
+    else:
+        print("\n[ERROR] Topic clustering failed!")
+        sys.exit(1)
@@ -3,7 +3,9 @@ Watsonx Service Module (Powered by Google Gemini)
 Handles LLM integration for AI-enhanced responses
 """
 
+import itertools
 import sys
+import time
 from pathlib import Path
 
 # Add parent directory to path for imports
@@ -13,21 +15,60 @@ from config import (
     GEMINI_MODEL_NAME,
     LLM_MAX_TOKENS,
     LLM_TEMPERATURE,
-    LLM_TOP_P
+    LLM_BACKEND
 )
+from services.context_builder import build_context, estimate_tokens
+from services.circuit_breaker import CircuitBreaker
+from services.llm_backends import create_backend
+from services.llm_limiter import LLMUnavailableError, shared_limiter
+from services.llm_retry import LLMMetrics, RetryPolicy, is_retryable, wait_with_timeout
+
+SYSTEM_INSTRUCTION = (
+    "You are an expert agricultural advisor for Indian farmers. "
+    "Provide practical, actionable advice based on the information provided."
+)
+
+LANG_MAP = {
+    'en': 'English',
+    'hi': 'Hindi',
+    'mr': 'Marathi',
+    'te': 'Telugu',
+    'ta': 'Tamil',
+    'kn': 'Kannada',
+    'bn': 'Bengali',
+    'gu': 'Gujarati',
+    'ml': 'Malayalam',
+    'pa': 'Punjabi'
+}
 
 
 class WatsonxService:
     """AI LLM Service (Powered by Google Gemini)"""
     
-    def __init__(self):
-        """Initialize service"""
+    def __init__(self, limiter=None, breaker=None):
+        """
+        Initialize service
+        
+        Args:
+            limiter: LLMLimiter for concurrency/rate (default: the process-wide one)
+            breaker: CircuitBreaker for the Gemini backend (default: a new one)
+        """
         self.api_key = GEMINI_API_KEY
         self.model_name = GEMINI_MODEL_NAME
-        self.client = None
+        self.backend_name = LLM_BACKEND
+        self.backend = None
+        self.metrics = LLMMetrics()
+        self.retry = RetryPolicy(self.metrics)
+        self.limiter = limiter or shared_limiter()
+        self.breaker = breaker or CircuitBreaker()
         
     def initialize(self):
-        """Initialize Gemini client"""
+        """Initialize the LLM backend (LLM_BACKEND: Gemini, or the fake for load tests)"""
+        if self.backend_name == 'fake':
+            self.backend = create_backend('fake')
+            print("[SUCCESS] Watsonx service initialized (fake LLM backend: no Gemini calls)")
+            return self
+        
         if not self.api_key:
             raise ValueError(
                 "Gemini API key not configured. "
@@ -35,10 +76,7 @@ class WatsonxService:
             )
         
         try:
-            from google import genai
-            
-            # Initialize client with API key
-            self.client = genai.Client(api_key=self.api_key)
+            self.backend = create_backend(self.backend_name, self.api_key, self.model_name)
             
             # Quick validation - list models to check key works
             print(f"[SUCCESS] Watsonx service initialized (Gemini: {self.model_name})")
@@ -52,43 +90,204 @@ class WatsonxService:
         except Exception as e:
             raise RuntimeError(f"Failed to initialize Watsonx service: {e}")
     
-    def generate_response(self, prompt, max_tokens=None, temperature=None):
+    def _generation_args(self, max_tokens=None, temperature=None):
+        return (SYSTEM_INSTRUCTION, max_tokens or LLM_MAX_TOKENS,
+                temperature if temperature is not None else LLM_TEMPERATURE)
+    
+    def _log_usage(self, prompt, response, start):
+        """Log prompt/output token counts (Gemini's own when reported) and latency"""
+        usage = getattr(response, 'usage_metadata', None)
+        prompt_tokens = getattr(usage, 'prompt_token_count', None) or estimate_tokens(prompt)
+        output_tokens = getattr(usage, 'candidates_token_count', None)
+        print(f"[INFO] LLM call: {prompt_tokens} prompt tokens, {output_tokens or '?'} output tokens, "
+              f"{time.perf_counter() - start:.2f}s")
+    
+    def stats(self):
+        """Call metrics plus limiter (queue depth) and circuit breaker state, for /api/health"""
+        return dict(self.metrics.stats(), limiter=self.limiter.stats(), circuit=self.breaker.stats())
+    
+    def _admit(self, timeout):
+        """
+        Pass the circuit breaker, then wait for a limiter slot
+        
+        Queueing takes at most half the attempt's timeout, so the call
+        itself always keeps the other half.
+        
+        Returns:
+            Seconds spent queueing
+        """
+        self.breaker.allow()
+        try:
+            return self.limiter.acquire(timeout / 2)
+        except BaseException:
+            self.breaker.record(0.0, None)
+            raise
+    
+    async def _admit_async(self, timeout):
+        self.breaker.allow()
+        try:
+            return await self.limiter.acquire_async(timeout / 2)
+        except BaseException:
+            self.breaker.record(0.0, None)
+            raise
+    
+    def _record(self, start, error=None):
+        # Only upstream trouble (timeouts, 429, 5xx) counts against Gemini; a
+        # cancelled call or a rejected request says nothing about its health
+        failed = False if error is None else (True if is_retryable(error) else None)
+        self.breaker.record(time.monotonic() - start, failed)
+    
+    def _limited(self, call):
+        """Wrap one attempt in the breaker and a limiter slot"""
+        def attempt(timeout):
+            waited = self._admit(timeout)
+            start = time.monotonic()
+            try:
+                result = call(timeout - waited)
+            except BaseException as e:
+                self._record(start, e)
+                raise
+            finally:
+                self.limiter.release()
+            self._record(start)
+            return result
+        return attempt
+    
+    def _limited_async(self, make_coro):
+        async def attempt(timeout):
+            waited = await self._admit_async(timeout)
+            start = time.monotonic()
+            try:
+                # Time out here rather than in the retry policy (self_timed), so the
+                # breaker sees a timeout, not a cancel
+                result = await wait_with_timeout(make_coro(timeout - waited), timeout - waited)
+            except BaseException as e:
+                self._record(start, e)
+                raise
+            finally:
+                self.limiter.release()
+            self._record(start)
+            return result
+        return attempt
+    
+    def generate_response(self, prompt, max_tokens=None, temperature=None, deadline=None):
         """
         Generate response using Gemini
         
+        Transient failures (timeouts, 429, 5xx) are retried with jittered
+        backoff while the deadline allows. Each attempt first passes the
+        circuit breaker and waits for an LLMLimiter slot; LLMUnavailableError
+        means the breaker is open or no slot came free in time.
+        
         Args:
             prompt: Input prompt
             max_tokens: Maximum tokens (overrides default)
             temperature: Sampling temperature (overrides default)
+            deadline: time.monotonic() by which all attempts must finish
+                      (default: LLM_REQUEST_DEADLINE from now)
             
         Returns:
             Generated text response
         """
-        if self.client is None:
+        if self.backend is None:
             raise RuntimeError("Service not initialized. Call initialize() first.")
         
         try:
-            from google.genai import types
+            start = time.perf_counter()
+            args = self._generation_args(max_tokens, temperature)
+            response = self.retry.run(self._limited(
+                lambda timeout: self.backend.generate(prompt, *args, timeout=timeout)
+            ), deadline)
+            self._log_usage(prompt, response, start)
             
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    system_instruction="You are an expert agricultural advisor for Indian farmers. Provide practical, actionable advice based on the information provided.",
-                    max_output_tokens=max_tokens or LLM_MAX_TOKENS,
-                    temperature=temperature if temperature is not None else LLM_TEMPERATURE,
-                    top_p=LLM_TOP_P,
-                ),
-            )
+            return response.text
+            
+        except LLMUnavailableError:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Failed to generate response: {e}")
+    
+    async def generate_response_async(self, prompt, max_tokens=None, temperature=None, deadline=None):
+        """Async generate_response (cancelling the task aborts the HTTP request)"""
+        if self.backend is None:
+            raise RuntimeError("Service not initialized. Call initialize() first.")
+        
+        try:
+            start = time.perf_counter()
+            args = self._generation_args(max_tokens, temperature)
+            response = await self.retry.run_async(self._limited_async(
+                lambda timeout: self.backend.generate_async(prompt, *args, timeout=timeout)
+            ), deadline, self_timed=True)
+            self._log_usage(prompt, response, start)
             
             return response.text
             
+        except LLMUnavailableError:
+            raise
         except Exception as e:
             raise RuntimeError(f"Failed to generate response: {e}")
     
-    def answer_query(self, query, context_qa_pairs, location_context=None, language='en'):
+    def generate_response_stream(self, prompt, max_tokens=None, temperature=None, deadline=None):
         """
-        Answer agricultural query using context from FAISS search
+        Generate response using Gemini, yielding text chunks as they arrive
+        
+        Only opening the stream (up to the first chunk) is retried: once
+        text has been sent to the client a retry would repeat it.
+        
+        Args:
+            prompt: Input prompt
+            max_tokens: Maximum tokens (overrides default)
+            temperature: Sampling temperature (overrides default)
+            deadline: time.monotonic() by which the stream must have started
+            
+        Yields:
+            Text chunks (concatenated, they equal generate_response's text)
+        """
+        if self.backend is None:
+            raise RuntimeError("Service not initialized. Call initialize() first.")
+        
+        def open_stream(timeout):
+            # The limiter slot is held until the stream ends, not just while opening;
+            # the breaker judges the time to the first chunk
+            waited = self._admit(timeout)
+            start = time.monotonic()
+            try:
+                stream = iter(self.backend.generate_stream(
+                    prompt, *self._generation_args(max_tokens, temperature), timeout=timeout - waited
+                ))
+                first = next(stream, None)
+            except BaseException as e:
+                self._record(start, e)
+                self.limiter.release()
+                raise
+            self._record(start)
+            return stream, first
+        
+        start = time.perf_counter()
+        last = None
+        try:
+            stream, first = self.retry.run(open_stream, deadline)
+        except LLMUnavailableError:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Failed to generate response: {e}")
+        try:
+            if first is None:
+                return
+            for chunk in itertools.chain([first], stream):
+                last = chunk
+                if chunk.text:
+                    yield chunk.text
+        except Exception as e:
+            raise RuntimeError(f"Failed to generate response: {e}")
+        finally:
+            self.limiter.release()
+        # The final chunk carries the usage totals
+        self._log_usage(prompt, last, start)
+    
+    def build_prompt(self, query, context_qa_pairs, location_context=None, language='en'):
+        """
+        Prompt for answering a query from retrieved Q&A pairs
         
         Args:
             query: User query
@@ -97,34 +296,17 @@ class WatsonxService:
             language: Target language code (e.g. 'hi', 'mr')
             
         Returns:
-            Generated answer
+            Prompt string
         """
-        LANG_MAP = {
-            'en': 'English',
-            'hi': 'Hindi',
-            'mr': 'Marathi',
-            'te': 'Telugu',
-            'ta': 'Tamil',
-            'kn': 'Kannada',
-            'bn': 'Bengali',
-            'gu': 'Gujarati',
-            'ml': 'Malayalam',
-            'pa': 'Punjabi'
-        }
-        
         lang_name = LANG_MAP.get(language, 'English')
         lang_instruction = ""
         if language != 'en':
             lang_instruction = f"- IMPORTANT: Answer ONLY in {lang_name} language."
 
-        # Build context from Q&A pairs
-        context_parts = []
-        for i, qa in enumerate(context_qa_pairs, 1):
-            q = qa.get('question', '')
-            a = qa.get('answer', '')
-            context_parts.append(f"{i}. Q: {q}\n   A: {a}")
-        
-        context = "\n\n".join(context_parts)
+        # Build context from Q&A pairs (deduplicated, truncated, within the token budget)
+        context, stats = build_context(context_qa_pairs)
+        print(f"[INFO] Prompt context: {stats['pairs_used']}/{stats['pairs_in']} pairs, "
+              f"{stats['duplicates']} duplicate, {stats['truncated']} truncated, ~{stats['tokens']} tokens")
         
         # Build location/date block
         loc_block = ""
@@ -135,7 +317,7 @@ Farmer's Context (use this to give location & season-specific advice):
 """
         
         # Create prompt
-        prompt = f"""You are an expert agricultural advisor for Indian farmers. Based on the following relevant information from the Kisan Call Centre database, provide a helpful and accurate answer to the farmer's question.
+        return f"""You are an expert agricultural advisor for Indian farmers. Based on the following relevant information from the Kisan Call Centre database, provide a helpful and accurate answer to the farmer's question.
 {loc_block}
 Relevant Information from Database:
 {context}
@@ -153,10 +335,57 @@ Instructions:
 {lang_instruction}
 
 Expert Answer:"""
+    
+    def build_fallback_prompt(self, query, location_context=None, language='en'):
+        """Prompt for answering without database context (retrieval found nothing)"""
+        lang_instr = ""
+        if language != 'en':
+            lang_instr = f"\nIMPORTANT: Answer strictly in {LANG_MAP.get(language, language)} language."
         
-        response = self.generate_response(prompt)
-        return response
-
+        return (
+            f"Context:\n{location_context or ''}\n"
+            f"A farmer asked: '{query}'.\n"
+            f"Provide a helpful, practical response specific to their "
+            f"location and the current season in India.\n"
+            f"{lang_instr}"
+        )
+    
+    def answer_query(self, query, context_qa_pairs, location_context=None, language='en', deadline=None):
+        """
+        Answer agricultural query using context from FAISS search
+        
+        Args:
+            query: User query
+            context_qa_pairs: List of relevant Q&A pairs from FAISS
+            location_context: Optional string with date/time/location/season info
+            language: Target language code (e.g. 'hi', 'mr')
+            deadline: time.monotonic() by which the answer is needed (optional)
+            
+        Returns:
+            Generated answer
+        """
+        prompt = self.build_prompt(query, context_qa_pairs, location_context, language)
+        return self.generate_response(prompt, deadline=deadline)
+    
+    async def answer_query_async(self, query, context_qa_pairs, location_context=None, language='en', deadline=None):
+        """Async answer_query"""
+        prompt = self.build_prompt(query, context_qa_pairs, location_context, language)
+        return await self.generate_response_async(prompt, deadline=deadline)
+    
+    def answer_query_stream(self, query, context_qa_pairs, location_context=None, language='en', deadline=None):
+        """Streaming answer_query: yields text chunks"""
+        prompt = self.build_prompt(query, context_qa_pairs, location_context, language)
+        return self.generate_response_stream(prompt, deadline=deadline)
+    
+    def answer_without_context_stream(self, query, location_context=None, language='en', deadline=None):
+        """Streaming no-context answer (retrieval found nothing): yields text chunks"""
+        prompt = self.build_fallback_prompt(query, location_context, language)
+        return self.generate_response_stream(prompt, deadline=deadline)
+    
+    async def answer_without_context_async(self, query, location_context=None, language='en', deadline=None):
+        """Answer from the model's own knowledge when retrieval found nothing"""
+        prompt = self.build_fallback_prompt(query, location_context, language)
+        return await self.generate_response_async(prompt, deadline=deadline)
 
 if __name__ == "__main__":
     print("=" * 60)
@@ -0,0 +1,19 @@
+"""Quick test for response cache keys (Hindi queries must not collide)"""
+from services.response_cache import cache_key, coarse_location, normalize_query
+
+
+def test_devanagari_keeps_vowel_signs():
+    assert normalize_query('गेहूं में खाद?') == 'गेहूं में खाद'
+    assert cache_key('मूंग की बुवाई', 'hi') != cache_key('मंगा की बुवाई', 'hi')
+    assert coarse_location('पुणे, महाराष्ट्र') != coarse_location('पण, महाराष्ट्र')
+
+
+def test_case_punctuation_and_spacing_ignored():
+    assert cache_key('How to control Aphids?', 'en') == cache_key('how to  control aphids', 'en')
+    assert cache_key('गेहूं में खाद।', 'hi') == cache_key('गेहूं  में खाद', 'hi')
+
+
+if __name__ == "__main__":
+    test_devanagari_keeps_vowel_signs()
+    test_case_punctuation_and_spacing_ignored()
+    print("[SUCCESS] Cache keys keep Hindi vowel signs and ignore case/punctuation")